@@ -0,0 +1,257 @@
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+from bill import BillManager
+from database import get_database
+from group import GroupNotFoundError
+from settlement import Settlement
+
+# Tables of the archive database. Rows keep the ids they had in the live database,
+# which never reuses them (AUTOINCREMENT), so archiving a group again replaces its rows.
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.groups (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        archived_at TEXT NOT NULL,
+        bill_count INTEGER NOT NULL,
+        total_amount REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_groups_name ON groups (name, archived_at)",
+    """
+    CREATE TABLE IF NOT EXISTS archive.participants (
+        id INTEGER PRIMARY KEY,
+        group_id INTEGER NOT NULL,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        nickname TEXT NOT NULL,
+        final_balance REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_participants_group ON participants (group_id)",
+    """
+    CREATE TABLE IF NOT EXISTS archive.bills (
+        id INTEGER PRIMARY KEY,
+        group_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        amount REAL NOT NULL,
+        date TEXT NOT NULL,
+        split_method TEXT NOT NULL,
+        paid_by INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_bills_group ON bills (group_id, id)",
+    """
+    CREATE TABLE IF NOT EXISTS archive.bill_splits (
+        bill_id INTEGER NOT NULL,
+        participant_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (bill_id, participant_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS archive.settlements (
+        group_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        debtor TEXT NOT NULL,
+        creditor TEXT NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (group_id, position)
+    ) WITHOUT ROWID
+    """,
+]
+
+
+def default_archive_path(db_path):
+    """Return the archive file that belongs to a live database: splitwise.db -> splitwise-archive.db."""
+    root, extension = os.path.splitext(db_path)
+    return f"{root}-archive{extension or '.db'}"
+
+
+class ArchiveManager:
+    """Move finished trips out of the live database into an attached archive database."""
+
+    def __init__(self, db=None, archive_path=None):
+        self.db = db or get_database()
+        self.archive_path = archive_path or default_archive_path(self.db.db_name)
+
+    @contextmanager
+    def attached(self):
+        """Attach the archive database as "archive" for the duration of the block."""
+        self.db.conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+        try:
+            for statement in ARCHIVE_SCHEMA:
+                self.db.conn.execute(statement)
+            yield
+        finally:
+            self.db.conn.execute("DETACH DATABASE archive")
+
+    def archive_group(self, group_name, compact=True, attempts=3):
+        """Move a group with its participants, bills and splits into the archive.
+
+        The final balances and settlements are stored with it. In WAL mode a transaction
+        is not atomic across attached files, so the copy is committed before the live
+        rows are deleted: an interrupted archive leaves the group in both databases, and
+        archiving it again completes it. The copy records the group's data_version and
+        the delete only runs if it is unchanged; if another connection wrote to the group
+        in between, the copy is redone, up to attempts times. Even then only rows that
+        are in the archive are deleted. The live rows are deleted explicitly, splits
+        first, since databases created before foreign key cascades have none. Afterwards
+        the freed pages are returned to the file system (see compact).
+
+        Returns the archived settlements.
+        """
+        group_id = self.db.identity.group_id(group_name)
+        if not group_id:
+            raise GroupNotFoundError(group_name)
+
+        with self.attached():
+            for _ in range(attempts):
+                version, settlements = self._copy_group(group_name, group_id)
+                if self._delete_group(group_id, version):
+                    break
+            else:
+                raise RuntimeError(f"Group '{group_name}' kept changing while it was being archived; try again.")
+
+        self.db.identity.invalidate_group(group_name)
+        self.db.results.invalidate(group_id)
+        if compact:
+            self.compact()
+        return settlements
+
+    def _copy_group(self, group_name, group_id):
+        """Copy a group into the archive in one transaction; return its data_version and settlements."""
+        with self.db.transaction() as cursor:
+            # Read under the write lock, so the settlements match the rows copied below
+            version = self.db.results.version(group_id)
+            settlements = BillManager(self.db).calculate_settlements(group_name, exact=True)
+
+            cursor.execute("""
+                INSERT OR REPLACE INTO archive.groups (id, name, archived_at, bill_count, total_amount)
+                SELECT g.id, g.name, ?, COUNT(b.id), COALESCE(SUM(b.amount), 0)
+                FROM groups g
+                LEFT JOIN bills b ON b.group_id = g.id
+                WHERE g.id = ?
+                GROUP BY g.id
+            """, (datetime.now().isoformat(timespec="seconds"), group_id))
+            cursor.execute("""
+                INSERT OR REPLACE INTO archive.participants
+                    (id, group_id, first_name, last_name, nickname, final_balance)
+                SELECT p.id, p.group_id, p.first_name, p.last_name, p.nickname, COALESCE(pb.balance, 0)
+                FROM participants p
+                LEFT JOIN participant_balances pb ON pb.participant_id = p.id
+                WHERE p.group_id = ?
+            """, (group_id,))
+            cursor.execute("""
+                INSERT OR REPLACE INTO archive.bills (id, group_id, title, amount, date, split_method, paid_by)
+                SELECT id, group_id, title, amount, date, split_method, paid_by
+                FROM bills
+                WHERE group_id = ?
+            """, (group_id,))
+            cursor.execute("""
+                INSERT OR REPLACE INTO archive.bill_splits (bill_id, participant_id, amount)
+                SELECT bs.bill_id, bs.participant_id, bs.amount
+                FROM bills b
+                JOIN bill_splits bs ON bs.bill_id = b.id
+                WHERE b.group_id = ?
+            """, (group_id,))
+            cursor.execute("DELETE FROM archive.settlements WHERE group_id = ?", (group_id,))
+            cursor.executemany("""
+                INSERT INTO archive.settlements (group_id, position, debtor, creditor, amount)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(group_id, position, *settlement) for position, settlement in enumerate(settlements)])
+        return version, settlements
+
+    def _delete_group(self, group_id, version):
+        """Delete the archived rows of a group from the live tables.
+
+        Returns False, deleting nothing, if the group changed since it was copied at version.
+        """
+        with self.db.transaction() as cursor:
+            if self.db.results.version(group_id) != version:
+                return False
+
+            complete = not cursor.execute("""
+                SELECT 1 FROM bills WHERE group_id = ? AND id NOT IN (SELECT id FROM archive.bills WHERE group_id = ?)
+                UNION ALL
+                SELECT 1 FROM participants
+                WHERE group_id = ? AND id NOT IN (SELECT id FROM archive.participants WHERE group_id = ?)
+                LIMIT 1
+            """, (group_id, group_id, group_id, group_id)).fetchone()
+            if complete:
+                # Balances first, so the balance triggers on the deletes below have nothing to update
+                cursor.execute("DELETE FROM participant_balances WHERE group_id = ?", (group_id,))
+
+            cursor.execute("""
+                DELETE FROM bill_splits
+                WHERE bill_id IN (SELECT id FROM bills WHERE group_id = ?)
+                  AND bill_id IN (SELECT id FROM archive.bills WHERE group_id = ?)
+            """, (group_id, group_id))
+            cursor.execute("""
+                DELETE FROM bills WHERE group_id = ? AND id IN (SELECT id FROM archive.bills WHERE group_id = ?)
+            """, (group_id, group_id))
+            if not complete:
+                # Something was not archived: the group and its participants stay, with balances
+                # kept right by the triggers on the deletes above
+                return True
+
+            cursor.execute("DELETE FROM participants WHERE group_id = ?", (group_id,))
+            cursor.execute("DELETE FROM settlement_cache WHERE group_id = ?", (group_id,))
+            cursor.execute("DELETE FROM groups WHERE id = ?", (group_id,))
+        return True
+
+    def compact(self):
+        """Return free pages of the live database to the file system.
+
+        Databases are created with auto_vacuum = INCREMENTAL; older files are switched
+        over with a one-time VACUUM. The WAL is checkpointed so the file really shrinks.
+        """
+        if self.db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.db.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.db.conn.execute("VACUUM")
+        # executescript steps the pragma to completion; execute would free a single page
+        self.db.conn.executescript("PRAGMA incremental_vacuum;")
+        self.db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def list_archived(self):
+        """Return (id, name, archived_at, bill_count, total_amount) for every archived group, newest first."""
+        with self.attached():
+            return self.db.fetch_all("""
+                SELECT id, name, archived_at, bill_count, total_amount
+                FROM archive.groups
+                ORDER BY archived_at DESC, id DESC
+            """)
+
+    def archived_group_id(self, group_name):
+        """Return the id of the most recently archived group with this name, or None."""
+        with self.attached():
+            result = self.db.fetch_one("""
+                SELECT id FROM archive.groups WHERE name = ? ORDER BY archived_at DESC, id DESC LIMIT 1
+            """, (group_name,))
+        return result[0] if result else None
+
+    def get_archived_balances(self, group_id):
+        """Return {nickname: final balance} of an archived group."""
+        with self.attached():
+            return dict(self.db.fetch_all("""
+                SELECT nickname, final_balance FROM archive.participants WHERE group_id = ? ORDER BY id
+            """, (group_id,)))
+
+    def get_archived_settlements(self, group_id):
+        with self.attached():
+            return [Settlement(*row) for row in self.db.fetch_all("""
+                SELECT debtor, creditor, amount FROM archive.settlements WHERE group_id = ? ORDER BY position
+            """, (group_id,))]
+
+    def get_archived_bills(self, group_id):
+        """Return (id, title, amount, date, split_method, payer nickname) for an archived group's bills."""
+        with self.attached():
+            return self.db.fetch_all("""
+                SELECT b.id, b.title, b.amount, b.date, b.split_method, p.nickname
+                FROM archive.bills b
+                LEFT JOIN archive.participants p ON p.id = b.paid_by
+                WHERE b.group_id = ?
+                ORDER BY b.id
+            """, (group_id,))
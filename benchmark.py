@@ -0,0 +1,294 @@
+"""Synthetic-data benchmarks for the core managers.
+
+Fills a temporary database with generated groups, participants and bills (a mix of
+equal and percentage splits), then times the hot operations and counts the SQL
+statements each one issues. Results are printed and can be written as JSON to
+compare runs:
+
+    python benchmark.py --groups 5 --participants 20 --bills 2000 --output bench.json
+    python benchmark.py --scaling
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from database import Database
+from group import GroupManager
+from participant import ParticipantManager
+from bill import BillManager
+import vectorized
+
+
+class QueryCounter:
+    """Count the statements a connection executes, using sqlite3's trace callback."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.count = 0
+
+    def __enter__(self):
+        self.count = 0
+        self.conn.set_trace_callback(self._trace)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.conn.set_trace_callback(None)
+
+    def _trace(self, statement):
+        self.count += 1
+
+
+# Reads that IdentityCache exists to avoid
+LOOKUP_QUERY = re.compile(r"^\s*SELECT\b.*\bFROM\s+(groups|participants)\b", re.IGNORECASE | re.DOTALL)
+
+
+def count_lookups(db, operation, repeat):
+    """Return the average number of group and participant lookups one call of operation issues."""
+    lookups = []
+    db.conn.set_trace_callback(lambda statement: lookups.append(statement) if LOOKUP_QUERY.match(statement) else None)
+    try:
+        for _ in range(repeat):
+            operation()
+    finally:
+        db.conn.set_trace_callback(None)
+    return len(lookups) / repeat
+
+
+def random_bill(rng, index, participants, percentage_ratio=0.3):
+    """Build an add_bill keyword dict with an equal or percentage split."""
+    bill = {
+        "title": f"Bill {index}",
+        "amount": round(rng.uniform(5, 500), 2),
+        "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "split_method": "Equal",
+        "paid_by": rng.choice(participants)[0],
+    }
+    if rng.random() < percentage_ratio:
+        weights = [rng.random() for _ in participants]
+        total = sum(weights)
+        percentages = [round(weight / total * 100, 2) for weight in weights]
+        percentages[-1] = round(100 - sum(percentages[:-1]), 2)
+        bill["split_method"] = "Percentage"
+        bill["split_values"] = [(nickname, percentage)
+                               for (_, nickname), percentage in zip(participants, percentages)]
+    return bill
+
+
+def populate(db, group_name, participant_count, bill_count, seed=0, percentage_ratio=0.3):
+    """Fill a group with participants and randomly paid bills, returning its BillManager."""
+    rng = random.Random(seed)
+    group_manager, participant_manager, bill_manager = GroupManager(db), ParticipantManager(db), BillManager(db)
+
+    group_manager.create_group(group_name)
+    for i in range(participant_count):
+        participant_manager.add_participant(group_name, "First", "Last", f"{group_name}-p{i}")
+    participants = db.fetch_all(
+        "SELECT id, nickname FROM participants WHERE group_id = ?", (bill_manager.get_group_id(group_name),))
+
+    bill_manager.add_bills(group_name, [
+        random_bill(rng, i, participants, percentage_ratio) for i in range(bill_count)
+    ])
+    return bill_manager
+
+
+def measure(db, operation, repeat, setup=None):
+    """Run operation repeat times and return its timings and per-call query count.
+
+    setup, if given, runs untimed and uncounted before every call.
+    """
+    timings = []
+    with QueryCounter(db.conn) as counter:
+        for _ in range(repeat):
+            if setup:
+                counted = counter.count
+                setup()
+                counter.count = counted
+            start = time.perf_counter()
+            operation()
+            timings.append(time.perf_counter() - start)
+    return {
+        "calls": repeat,
+        "total_seconds": sum(timings),
+        "mean_seconds": statistics.mean(timings),
+        "max_seconds": max(timings),
+        "queries_per_call": counter.count / repeat,
+    }
+
+
+def clear_result_cache(db):
+    """Forget cached balances and settlements, as a change to the group would."""
+    db.results.clear()
+    db.execute_query("DELETE FROM settlement_cache")
+
+
+def load_bill_table(bill_manager, group_name, page_size=200):
+    """The read BillManagementWindow performs when it opens: the first page of bills."""
+    return bill_manager.get_bill_page(group_name, 0, page_size)
+
+
+def scroll_bill_table(bill_manager, group_name, page_size=200):
+    """Page through every bill of a group, as scrolling the bill table to the end does."""
+    after_id = 0
+    while True:
+        page = bill_manager.get_bill_page(group_name, after_id, page_size)
+        if not page:
+            return
+        after_id = page[-1].id
+
+
+def run_suite(db_path, groups, participants, bills, repeat=5, seed=0, percentage_ratio=0.3):
+    """Populate db_path and time every benchmarked operation on the first group."""
+    db = Database(db_path)
+    rng = random.Random(seed)
+    group_names = [f"Group{i}" for i in range(groups)]
+
+    start = time.perf_counter()
+    for i, group_name in enumerate(group_names):
+        bill_manager = populate(db, group_name, participants, bills, seed + i, percentage_ratio)
+    populate_seconds = time.perf_counter() - start
+
+    group_manager = GroupManager(db)
+    group_name = group_names[0]
+    members = db.fetch_all(
+        "SELECT id, nickname FROM participants WHERE group_id = ?", (bill_manager.get_group_id(group_name),))
+    bill_index = itertools.count(bills)
+
+    results = {
+        "add_bill": measure(db, lambda: bill_manager.add_bill(
+            group_name, **random_bill(rng, next(bill_index), members, percentage_ratio)), repeat),
+        "calculate_balances": measure(db, lambda: bill_manager.calculate_balances(group_name), repeat,
+                                      lambda: clear_result_cache(db)),
+        "calculate_settlements": measure(db, lambda: bill_manager.calculate_settlements(group_name), repeat,
+                                         lambda: clear_result_cache(db)),
+        "calculate_settlements_cached": measure(db, lambda: bill_manager.calculate_settlements(group_name), repeat),
+        "list_groups": measure(db, group_manager.list_groups, repeat),
+        "bill_table": measure(db, lambda: load_bill_table(bill_manager, group_name), repeat),
+        "bill_table_scroll": measure(db, lambda: scroll_bill_table(bill_manager, group_name), repeat),
+    }
+    # Warmed up by the calls above, adding bills must not look up ids again
+    lookups = count_lookups(db, lambda: bill_manager.add_bill(
+        group_name, **random_bill(rng, next(bill_index), members, percentage_ratio)), repeat)
+    db.close_connection()
+    return {"populate_seconds": populate_seconds, "operations": results, "add_bill_lookups": lookups}
+
+
+def bench_balance_queries(bill_counts=(100, 1000, 5000), participant_count=20):
+    """Show that calculate_balances issues a constant number of queries as bills grow."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for bill_count in bill_counts:
+            db = Database(os.path.join(tmp, f"bench_{bill_count}.db"))
+            bill_manager = populate(db, "Bench", participant_count, bill_count)
+
+            with QueryCounter(db.conn) as counter:
+                start = time.perf_counter()
+                bill_manager.calculate_balances("Bench")
+                elapsed = time.perf_counter() - start
+
+            results.append((bill_count, counter.count, elapsed))
+            db.close_connection()
+    return results
+
+
+def bench_backends(participants, bills, repeat=3):
+    """Compare the SQL/pure-Python paths with the NumPy backend on one large group."""
+    if not vectorized.available():
+        raise SystemExit("NumPy is not installed; nothing to compare.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "backends.db"))
+        bill_manager = populate(db, "Event", participants, bills, percentage_ratio=0.0)
+        group_id = bill_manager.get_group_id("Event")
+        members = bill_manager.get_group_members(group_id)
+        payer_id = next(iter(members.values()))
+        percentages = [(nickname, 100 / len(members)) for nickname in members]
+
+        def prepare(split_method, min_participants):
+            saved, vectorized.MIN_PARTICIPANTS = vectorized.MIN_PARTICIPANTS, min_participants
+            try:
+                bill_manager._prepare_bill("Event", group_id, members, "Bench", 1234.5, "2024-01-01",
+                                           split_method, percentages, payer_id)
+            finally:
+                vectorized.MIN_PARTICIPANTS = saved
+
+        results = {
+            "balances_sql": measure(db, lambda: bill_manager.recompute_balances(group_id, "sql"), repeat),
+            "balances_numpy": measure(db, lambda: bill_manager.recompute_balances(group_id, "numpy"), repeat),
+            "percentage_split_python": measure(db, lambda: prepare("Percentage", float("inf")), repeat),
+            "percentage_split_numpy": measure(db, lambda: prepare("Percentage", 0), repeat),
+        }
+        db.close_connection()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xsplittr benchmarks")
+    parser.add_argument("--groups", type=int, default=3, help="Number of groups to generate")
+    parser.add_argument("--participants", type=int, default=20, help="Participants per group")
+    parser.add_argument("--bills", type=int, default=1000, help="Bills per group")
+    parser.add_argument("--percentage-ratio", type=float, default=0.3, help="Share of bills split by percentage")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per operation")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated data")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--scaling", action="store_true",
+                        help="Only show calculate_balances query counts for growing bill counts")
+    parser.add_argument("--backends", action="store_true",
+                        help="Compare the pure-Python and NumPy backends on one group of "
+                             "--participants people and --bills bills")
+    args = parser.parse_args()
+
+    if args.backends:
+        print(f"{'operation':<26} {'mean ms':>10}")
+        for name, result in bench_backends(args.participants, args.bills, args.repeat).items():
+            print(f"{name:<26} {result['mean_seconds'] * 1000:>10.2f}")
+        return
+
+    if args.scaling:
+        print(f"{'bills':>8} {'queries':>8} {'seconds':>10}")
+        for bill_count, queries, elapsed in bench_balance_queries():
+            print(f"{bill_count:>8} {queries:>8} {elapsed:>10.4f}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        suite = run_suite(os.path.join(tmp, "bench.db"), args.groups, args.participants, args.bills,
+                          args.repeat, args.seed, args.percentage_ratio)
+
+    report = {
+        "config": {
+            "groups": args.groups,
+            "participants": args.participants,
+            "bills": args.bills,
+            "percentage_ratio": args.percentage_ratio,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        **suite,
+    }
+
+    print(f"Populated in {suite['populate_seconds']:.2f}s")
+    print(f"Group/participant lookups per warm add_bill: {suite['add_bill_lookups']:.0f}")
+    print(f"{'operation':<28} {'mean ms':>10} {'max ms':>10} {'queries':>8}")
+    for name, result in suite["operations"].items():
+        print(f"{name:<28} {result['mean_seconds'] * 1000:>10.2f} {result['max_seconds'] * 1000:>10.2f} "
+              f"{result['queries_per_call']:>8.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,174 @@
-from database import Database
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from database import Database, get_database
+from dates import date_window, normalize_date
+from group import GroupNotFoundError
+from rows import Bill, BillListing, SplitColumns
+from settlement import Settlement, settle
+from splits import SPLIT_METHODS, compute_splits, split_method_name, to_cents
+import vectorized
 
 class BillManager:
-    SPLIT_METHODS = ["Equal", "Percentage"]
+    SPLIT_METHODS = SPLIT_METHODS
 
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        self.db = db or get_database()
 
-    def add_bill(self, group_name, title, amount, date, split_method, percentages=None, paid_by=None):
+    def add_bill(self, group_name, title, amount, date, split_method, split_values=None, paid_by=None):
+        """Add a bill and its splits in one transaction and return its id.
+
+        split_values depends on split_method, see splits.py: nicknames to share an Equal
+        split among, or (nickname, value) pairs for Percentage, Shares and Exact splits.
+        """
+        group_id = self.get_group_id(group_name)
+        if not group_id:
+            raise GroupNotFoundError(group_name)
+
+        members = self.get_group_members(group_id)
+        bill_row, split_rows = self._prepare_bill(group_name, group_id, members, title, amount, date,
+                                                  split_method, split_values, paid_by)
+
+        # Write the bill and all of its splits in one transaction
+        with self.db.transaction() as cursor:
+            return self._insert_bill(cursor, bill_row, split_rows)
+
+    def add_bills(self, group_name, bills):
+        """Add a list of bills to a group atomically.
+
+        Each bill is a dict with the keyword arguments of add_bill (title, amount, date,
+        split_method and optionally split_values and paid_by). Either all bills are
+        written or none are.
+        """
+        group_id = self.get_group_id(group_name)
+        if not group_id:
+            raise GroupNotFoundError(group_name)
+
+        members = self.get_group_members(group_id)
+        prepared = [
+            self._prepare_bill(group_name, group_id, members, bill["title"], bill["amount"], bill["date"],
+                               bill["split_method"], bill.get("split_values"), bill.get("paid_by"))
+            for bill in bills
+        ]
+
+        with self.db.transaction() as cursor:
+            return self._insert_bills(cursor, prepared)
+
+    def import_bills(self, group_name, rows, chunk_size=1000, progress=None):
+        """Stream bills into a group in chunked transactions.
+
+        rows yields (line_number, record) pairs, where record is a dict with title,
+        amount, date, optionally split_method (default Equal), paid_by as a nickname and
+        split_values as for add_bill. Invalid rows, and records the
+        reader marked with an "error" message, are skipped and reported instead of
+        aborting the load. progress, if given, is called with
+        (processed, imported, rejected) after every chunk.
+
+        Returns (imported, rejected), where rejected is a list of (line_number, reason).
+        """
         group_id = self.get_group_id(group_name)
         if not group_id:
-            raise ValueError(f"Group '{group_name}' does not exist.")
+            raise GroupNotFoundError(group_name)
 
+        members = self.get_group_members(group_id)
+        imported, processed, rejected, chunk = 0, 0, [], []
+
+        def flush():
+            with self.db.transaction() as cursor:
+                self._insert_bills(cursor, chunk)
+            if progress:
+                progress(processed, imported + len(chunk), len(rejected))
+            return len(chunk)
+
+        for line_number, record in rows:
+            processed += 1
+            try:
+                if "error" in record:
+                    raise ValueError(record["error"])
+                payer = record.get("paid_by")
+                if payer not in members:
+                    raise ValueError(f"Payer '{payer}' is not part of the group '{group_name}'.")
+                chunk.append(self._prepare_bill(
+                    group_name, group_id, members, record["title"], float(record["amount"]), record["date"],
+                    record.get("split_method") or "Equal", record.get("split_values"), members[payer]))
+            except (KeyError, TypeError, ValueError, OverflowError) as e:
+                rejected.append((line_number, str(e)))
+                continue
+
+            if len(chunk) >= chunk_size:
+                imported += flush()
+                chunk = []
+
+        if chunk:
+            imported += flush()
+        return imported, rejected
+
+    def get_group_members(self, group_id):
+        """Return {nickname: participant_id} for every participant of a group."""
+        return self.db.identity.members(group_id)
+
+    def _prepare_bill(self, group_name, group_id, members, title, amount, date, split_method,
+                      split_values=None, paid_by=None):
+        """Validate a bill and compute its row and split rows without touching the database.
+
+        members is the {nickname: participant_id} map of the group.
+        """
+        if not math.isfinite(amount):
+            raise ValueError(f"The bill amount must be a number, not {amount}.")
+        # Store the amount the splits are computed from: whole cents
+        amount = to_cents(amount) / 100
+        if amount <= 0:
+            raise ValueError("The bill amount must be greater than zero.")
         if not paid_by:
             raise ValueError("A payer must be specified for the bill.")
-        if not self.db.fetch_one("SELECT id FROM participants WHERE id = ? AND group_id = ?", (paid_by, group_id)):
+        if paid_by not in members.values():
             raise ValueError(f"Payer ID {paid_by} is not valid or not part of the group '{group_name}'.")
 
-        query = """
+        date = normalize_date(date)
+        split_method = split_method_name(split_method)
+        split_rows = compute_splits(amount, split_method, members, split_values, group_name)
+        return (title, amount, date, split_method, group_id, paid_by), split_rows
+
+    @staticmethod
+    def _insert_bill(cursor, bill_row, split_rows):
+        """Insert a prepared bill and its splits using the caller's transaction."""
+        bill_id = cursor.execute("""
             INSERT INTO bills (title, amount, date, split_method, group_id, paid_by)
             VALUES (?, ?, ?, ?, ?, ?)
-        """
-        bill_id = self.db.execute_query(query, (title, amount, date, split_method, group_id, paid_by)).lastrowid
-
-        participants = self.db.fetch_all("SELECT id FROM participants WHERE group_id = ?", (group_id,))
-        if not participants:
-            raise ValueError("Cannot add a bill to a group with no participants.")
-
-        if split_method.lower() == "percentage" and percentages:
-            for participant_name, percentage in percentages:
-                participant_id = self.db.fetch_one("""
-                    SELECT id FROM participants WHERE nickname = ?
-                """, (participant_name,))[0]
-
-                owed_amount = self.round_to_nearest_five_cents(amount * (percentage / 100))
+        """, bill_row).lastrowid
 
-                self.db.execute_query("""
-                    INSERT INTO bill_splits (bill_id, participant_id, amount)
-                    VALUES (?, ?, ?)
-                """, (bill_id, participant_id, owed_amount))
+        cursor.executemany("""
+            INSERT INTO bill_splits (bill_id, participant_id, amount)
+            VALUES (?, ?, ?)
+        """, [(bill_id, participant_id, owed_amount) for participant_id, owed_amount in split_rows])
+        return bill_id
 
-        elif split_method.lower() == "equal":
-            per_person_amount = self.round_to_nearest_five_cents(amount / len(participants))
+    @staticmethod
+    def _insert_bills(cursor, prepared):
+        """Insert prepared (bill_row, split_rows) pairs with two executemany calls.
 
-            for participant in participants:
-                participant_id = participant[0]
-                self.db.execute_query("""
-                    INSERT INTO bill_splits (bill_id, participant_id, amount)
-                    VALUES (?, ?, ?)
-                """, (bill_id, participant_id, per_person_amount))
+        bills uses AUTOINCREMENT and the caller's transaction holds the write lock, so
+        the new bills get consecutive ids ending at the table's sqlite_sequence value.
+        """
+        if not prepared:
+            return []
+        cursor.executemany("""
+            INSERT INTO bills (title, amount, date, split_method, group_id, paid_by)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [bill_row for bill_row, _ in prepared])
+        last_id = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'bills'").fetchone()[0]
+        bill_ids = range(last_id - len(prepared) + 1, last_id + 1)
 
-        else:
-            raise ValueError("Unsupported split method or missing percentage data.")
+        cursor.executemany("""
+            INSERT INTO bill_splits (bill_id, participant_id, amount)
+            VALUES (?, ?, ?)
+        """, (
+            (bill_id, participant_id, owed_amount)
+            for bill_id, (_, split_rows) in zip(bill_ids, prepared)
+            for participant_id, owed_amount in split_rows
+        ))
+        return list(bill_ids)
 
     def get_recent_bills(self):
         query = """
@@ -62,97 +180,328 @@ class BillManager:
         """
         return self.db.fetch_all(query)
 
-    @staticmethod
-    def round_to_nearest_five_cents(amount):
-        return round(amount * 20) / 20
+    def get_bill_page(self, group_name, after_id=0, limit=200):
+        """Return up to limit bills of a group with an id above after_id, in id order.
 
-    def remove_bill(self, bill_id):
+        Rows are BillListing objects whose split_details are built with GROUP_CONCAT
+        in the same query.
+        """
+        group_id = self.get_group_id(group_name)
+        if not group_id:
+            raise GroupNotFoundError(group_name)
+
+        return self.db.fetch_objects("""
+            SELECT b.id, b.title, b.amount, b.date, b.split_method,
+                   GROUP_CONCAT(p.nickname || ' Owes: CHF ' || printf('%.2f', bs.amount), ', ')
+            FROM (
+                SELECT id, title, amount, date, split_method
+                FROM bills
+                WHERE group_id = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            ) b
+            LEFT JOIN bill_splits bs ON bs.bill_id = b.id
+            LEFT JOIN participants p ON p.id = bs.participant_id
+            GROUP BY b.id
+            ORDER BY b.id
+        """, (group_id, after_id, limit), BillListing)
+
+    def search_bills(self, group_name, text, limit=200):
+        """Return up to limit bills of a group whose title matches text, best matches first.
+
+        Every word of text must appear in the title, as a word or the start of one, so
+        "din res" finds "Dinner at the restaurant". Matches come from the bills_fts
+        index, ranked by bm25. Rows are BillListing objects, as from get_bill_page.
+        """
+        group_id = self.get_group_id(group_name)
+        if not group_id:
+            raise GroupNotFoundError(group_name)
+        match = title_match_expression(text)
+        if not match:
+            return []
+
+        return self.db.fetch_objects("""
+            SELECT b.id, b.title, b.amount, b.date, b.split_method,
+                   GROUP_CONCAT(p.nickname || ' Owes: CHF ' || printf('%.2f', bs.amount), ', ')
+            FROM (
+                SELECT bills.id, bills.title, bills.amount, bills.date, bills.split_method, bills_fts.rank
+                FROM bills_fts
+                JOIN bills ON bills.id = bills_fts.rowid
+                WHERE bills_fts MATCH ? AND bills.group_id = ?
+                ORDER BY bills_fts.rank
+                LIMIT ?
+            ) b
+            LEFT JOIN bill_splits bs ON bs.bill_id = b.id
+            LEFT JOIN participants p ON p.id = bs.participant_id
+            GROUP BY b.id
+            ORDER BY b.rank, b.id
+        """, (match, group_id, limit), BillListing)
+
+    def get_bill_row(self, bill_id):
+        """Return a single bill in the row format of get_bill_page."""
+        rows = self.db.fetch_objects("""
+            SELECT b.id, b.title, b.amount, b.date, b.split_method,
+                   GROUP_CONCAT(p.nickname || ' Owes: CHF ' || printf('%.2f', bs.amount), ', ')
+            FROM bills b
+            LEFT JOIN bill_splits bs ON bs.bill_id = b.id
+            LEFT JOIN participants p ON p.id = bs.participant_id
+            WHERE b.id = ?
+            GROUP BY b.id
+        """, (bill_id,), BillListing)
+        return rows[0] if rows else None
 
+    def get_bills(self, group_name):
+        """Return every bill of a group as Bill objects."""
+        group_id = self.get_group_id(group_name)
+        if not group_id:
+            raise GroupNotFoundError(group_name)
+
+        return self.db.fetch_objects("""
+            SELECT id, title, amount, date, split_method, paid_by, group_id
+            FROM bills
+            WHERE group_id = ?
+            ORDER BY id
+        """, (group_id,), Bill)
+
+    def bills_between(self, group_name, start=None, end=None):
+        """Return the bills of a group dated from start to end, both inclusive, in date order.
+
+        Dates are given in any form normalize_date accepts; leave one out for an open window.
+        """
+        group_id = self.get_group_id(group_name)
+        if not group_id:
+            raise GroupNotFoundError(group_name)
+        start, end = date_window(start, end)
+
+        return self.db.fetch_objects("""
+            SELECT id, title, amount, date, split_method, paid_by, group_id
+            FROM bills
+            WHERE group_id = ? AND date >= ? AND date <= ?
+            ORDER BY date, id
+        """, (group_id, start or "", end or "9999-12-31"), Bill)
+
+    def load_splits(self, group_name, batch_size=10000):
+        """Load every split of a group into array-backed SplitColumns, streaming the rows."""
+        group_id = self.get_group_id(group_name)
+        if not group_id:
+            raise GroupNotFoundError(group_name)
+
+        return SplitColumns.from_rows(self.db.iter_rows("""
+            SELECT bs.bill_id, bs.participant_id, bs.amount
+            FROM bills b
+            JOIN bill_splits bs ON bs.bill_id = b.id
+            WHERE b.group_id = ?
+            ORDER BY b.id
+        """, (group_id,), batch_size))
+
+    def remove_bill(self, bill_id):
+        """Delete a bill and its splits; return False if there is no bill with this id."""
         try:
-            self.db.execute_query("DELETE FROM bill_splits WHERE bill_id = ?", (bill_id,))
-            self.db.execute_query("DELETE FROM bills WHERE id = ?", (bill_id,))
+            with self.db.transaction() as cursor:
+                cursor.execute("DELETE FROM bill_splits WHERE bill_id = ?", (bill_id,))
+                return cursor.execute("DELETE FROM bills WHERE id = ?", (bill_id,)).rowcount > 0
         except Exception as e:
             raise RuntimeError(f"Failed to remove bill with ID {bill_id}: {e}")
 
     def get_group_id(self, group_name):
-        query = "SELECT id FROM groups WHERE name = ?"
-        result = self.db.fetch_one(query, (group_name,))
-        return result[0] if result else None
+        return self.db.identity.group_id(group_name)
 
-    def calculate_balances(self, group_name):
+    def calculate_balances(self, group_name, start=None, end=None):
+        """Return {nickname: balance} for a group, over all bills or only those dated start to end."""
         group_id = self.get_group_id(group_name)
         if not group_id:
-            raise ValueError(f"Group '{group_name}' does not exist.")
+            raise GroupNotFoundError(group_name)
+
+        start, end = date_window(start, end)
+        if start or end:
+            # Windows are arbitrary, so their results are not cached; the range scan is cheap
+            return self._read_window_balances(group_id, start, end)
+        return dict(self.db.results.get(group_id, "balances", lambda: self._read_balances(group_id)))
 
-        # Fetch all participants in the group
-        participants = self.db.fetch_all("""
-            SELECT id, nickname FROM participants WHERE group_id = ?
+    def _read_balances(self, group_id):
+        # participant_balances is maintained by triggers on every bill and split write
+        rows = self.db.fetch_all("""
+            SELECT p.nickname, pb.balance
+            FROM participant_balances pb
+            JOIN participants p ON p.id = pb.participant_id
+            WHERE pb.group_id = ?
         """, (group_id,))
 
-        balances = {participant[1]: 0.0 for participant in participants}  # Initialize balances
+        return {nickname: balance for nickname, balance in rows}
 
-        # Fetch all bills and their splits for the group
-        bills = self.db.fetch_all("""
-            SELECT id, paid_by, amount FROM bills WHERE group_id = ?
-        """, (group_id,))
+    def _read_window_balances(self, group_id, start, end):
+        # Paid minus owed over the bills in the window, found with a range scan of idx_bills_group_date
+        rows = self.db.fetch_all("""
+            WITH window_bills AS (
+                SELECT id, paid_by, amount
+                FROM bills
+                WHERE group_id = :group_id AND date >= :start AND date <= :end
+            ),
+            paid AS (
+                SELECT paid_by AS participant_id, SUM(amount) AS total
+                FROM window_bills
+                GROUP BY paid_by
+            ),
+            owed AS (
+                -- CROSS JOIN keeps the bills in the window first, so their splits are looked up
+                -- by bill instead of scanning every split by participant
+                SELECT bs.participant_id, SUM(bs.amount) AS total
+                FROM window_bills b
+                CROSS JOIN bill_splits bs ON bs.bill_id = b.id
+                GROUP BY bs.participant_id
+            )
+            SELECT p.nickname, COALESCE(paid.total, 0.0) - COALESCE(owed.total, 0.0)
+            FROM participants p
+            LEFT JOIN paid ON paid.participant_id = p.id
+            LEFT JOIN owed ON owed.participant_id = p.id
+            WHERE p.group_id = :group_id
+        """, {"group_id": group_id, "start": start or "", "end": end or "9999-12-31"})
+
+        return {nickname: balance for nickname, balance in rows}
+
+    def recompute_balances(self, group_id, backend=None):
+        """Recompute {participant_id: balance} for a group from the full bill history.
+
+        backend is "sql" or "numpy"; by default NumPy is used for groups whose
+        estimated split count exceeds vectorized.MIN_SPLITS, if it is installed.
+        """
+        if backend is None:
+            backend = "numpy" if self._use_vectorized_balances(group_id) else "sql"
+        if backend == "numpy":
+            return vectorized.balances(self.db, group_id)
+
+        # Amount paid minus amount owed per participant, aggregated in a single query
+        rows = self.db.fetch_all("""
+            WITH paid AS (
+                SELECT paid_by AS participant_id, SUM(amount) AS total
+                FROM bills
+                WHERE group_id = :group_id
+                GROUP BY paid_by
+            ),
+            owed AS (
+                SELECT bs.participant_id, SUM(bs.amount) AS total
+                FROM bill_splits bs
+                JOIN bills b ON b.id = bs.bill_id
+                WHERE b.group_id = :group_id
+                GROUP BY bs.participant_id
+            )
+            SELECT p.id, COALESCE(paid.total, 0.0) - COALESCE(owed.total, 0.0)
+            FROM participants p
+            LEFT JOIN paid ON paid.participant_id = p.id
+            LEFT JOIN owed ON owed.participant_id = p.id
+            WHERE p.group_id = :group_id
+        """, {"group_id": group_id})
+
+        return dict(rows)
 
-        for bill_id, paid_by, amount in bills:
-            # Fetch splits for the bill
-            splits = self.db.fetch_all("""
-                SELECT participant_id, amount FROM bill_splits WHERE bill_id = ?
-            """, (bill_id,))
-
-            payer_nickname = self.db.fetch_one("""
-                SELECT nickname FROM participants WHERE id = ?
-            """, (paid_by,))[0]
-            balances[payer_nickname] += amount
-
-            for participant_id, owed_amount in splits:
-                participant_nickname = self.db.fetch_one("""
-                    SELECT nickname FROM participants WHERE id = ?
-                """, (participant_id,))[0]
-                balances[participant_nickname] -= owed_amount
-        return balances
-
-    def calculate_settlements(self, group_name):
+    def _use_vectorized_balances(self, group_id):
+        if not vectorized.available():
+            return False
+        bill_count = self.db.fetch_one("SELECT COUNT(*) FROM bills WHERE group_id = ?", (group_id,))[0]
+        return bill_count * len(self.get_group_members(group_id)) >= vectorized.MIN_SPLITS
+
+    def rebuild_balances(self, group_name=None, dry_run=False, tolerance=0.005):
+        """Check participant_balances against a full recompute and rewrite it.
+
+        Covers one group, or every group when group_name is None. Returns the
+        mismatches as (group, nickname, stored, expected) tuples; with dry_run the
+        table is only checked, not rewritten.
+        """
+        if group_name is None:
+            groups = self.db.fetch_all("SELECT id, name FROM groups")
+        else:
+            group_id = self.get_group_id(group_name)
+            if not group_id:
+                raise GroupNotFoundError(group_name)
+            groups = [(group_id, group_name)]
+
+        mismatches = []
+        with self.db.transaction() as cursor:
+            for group_id, name in groups:
+                expected = self.recompute_balances(group_id)
+                stored = dict(cursor.execute("""
+                    SELECT participant_id, balance FROM participant_balances WHERE group_id = ?
+                """, (group_id,)).fetchall())
+                nicknames = dict(cursor.execute("""
+                    SELECT id, nickname FROM participants WHERE group_id = ?
+                """, (group_id,)).fetchall())
+
+                for participant_id, balance in expected.items():
+                    if participant_id not in stored or abs(stored[participant_id] - balance) > tolerance:
+                        mismatches.append((name, nicknames[participant_id], stored.get(participant_id), balance))
+
+                if not dry_run:
+                    # Cached results were computed from the old balances
+                    cursor.execute("UPDATE groups SET data_version = data_version + 1 WHERE id = ?", (group_id,))
+                    cursor.execute("DELETE FROM participant_balances WHERE group_id = ?", (group_id,))
+                    cursor.executemany("""
+                        INSERT INTO participant_balances (participant_id, group_id, balance) VALUES (?, ?, ?)
+                    """, [(participant_id, group_id, balance) for participant_id, balance in expected.items()])
+        return mismatches
+
+    def settle_all_groups(self, group_names=None, exact=False, time_budget=0.5, workers=None,
+                          start=None, end=None):
+        """Calculate the settlements of many groups in parallel.
+
+        The groups (every group by default) are spread across a ProcessPoolExecutor
+        with up to workers processes, each reading through its own read-only
+        connection. start and end limit the bills as in calculate_settlements.
+        Returns {group_name: [Settlement, ...]} in group order.
+        """
+        start, end = date_window(start, end)
+        if group_names is None:
+            group_names = [name for name, in self.db.fetch_all("SELECT name FROM groups ORDER BY name")]
+        if not group_names:
+            return {}
+
+        workers = min(workers or os.cpu_count() or 1, len(group_names))
+        chunksize = max(1, len(group_names) // (workers * 4))
+        settle_group = partial(_settle_group, exact=exact, time_budget=time_budget, start=start, end=end)
+        with ProcessPoolExecutor(workers, initializer=_open_worker_database, initargs=(self.db.db_name,)) as pool:
+            return dict(zip(group_names, pool.map(settle_group, group_names, chunksize=chunksize)))
+
+    def calculate_settlements(self, group_name, exact=False, time_budget=0.5, start=None, end=None):
+        """Return the transfers that settle the group as Settlement(debtor, creditor, amount) records.
+
+        Balances are netted per person first, so a group of n people needs at most n-1
+        transfers. With exact=True small groups are solved for the fewest possible
+        transfers within time_budget seconds. With start or end only the bills dated in
+        that window are settled. Use settlement.format_settlement for display.
+
+        Settlements of the whole group are cached, also across restarts, until the group's
+        bills or participants change; settlements of a date window are not cached.
+        """
         group_id = self.get_group_id(group_name)
         if not group_id:
-            raise ValueError(f"Group '{group_name}' does not exist.")
-
-        # Fetch all debts for the specific group
-        debts = self.db.fetch_all("""
-            SELECT p2.nickname AS payer, p1.nickname AS participant, bs.amount
-            FROM bill_splits bs
-            JOIN participants p1 ON p1.id = bs.participant_id
-            JOIN participants p2 ON p2.id = (SELECT paid_by FROM bills WHERE id = bs.bill_id)
-            WHERE bs.bill_id IN (
-                SELECT id FROM bills WHERE group_id = ?
-            )
-        """, (group_id,))
+            raise GroupNotFoundError(group_name)
+
+        start, end = date_window(start, end)
+        if start or end:
+            return settle(self.calculate_balances(group_name, start, end), exact=exact, time_budget=time_budget)
+        return list(self.db.results.get(
+            group_id, "settlements:exact" if exact else "settlements",
+            lambda: settle(self.calculate_balances(group_name), exact=exact, time_budget=time_budget),
+            persist=True, decode=lambda rows: [Settlement(*row) for row in rows]))
+
+
+# Per-process state for settle_all_groups workers
+_worker_db = None
+
+
+def title_match_expression(text):
+    """Turn free text into an FTS5 query: every word, quoted, as a prefix.
+
+    Quoting keeps characters such as quotes, hyphens and colons from being read as
+    FTS5 syntax. Returns an empty string when text has no words.
+    """
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in text.split())
+
+
+def _open_worker_database(db_name):
+    global _worker_db
+    _worker_db = Database(db_name, read_only=True)
 
-        # Use a dictionary to calculate pairwise debts
-        debt_map = {}
-        for payer, participant, amount in debts:
-            if payer == participant:
-                continue
-            if (participant, payer) in debt_map:
-                existing_debt = debt_map[(participant, payer)]
-                if existing_debt > amount:
-                    debt_map[(participant, payer)] -= amount
-                else:
-                    debt_map.pop((participant, payer))
-                    amount -= existing_debt
-                    if amount > 0:
-                        debt_map[(payer, participant)] = amount
-            else:
-                # Add new debt
-                if (payer, participant) in debt_map:
-                    debt_map[(payer, participant)] += amount
-                else:
-                    debt_map[(payer, participant)] = amount
-
-        # Generate settlements
-        settlements = [f"{participant} owes {payer} CHF {amount:.2f}" for (payer, participant), amount in debt_map.items()]
-
-        return settlements
 
+def _settle_group(group_name, exact, time_budget, start=None, end=None):
+    return BillManager(_worker_db).calculate_settlements(group_name, exact=exact, time_budget=time_budget,
+                                                         start=start, end=end)
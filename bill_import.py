@@ -0,0 +1,66 @@
+"""Readers that stream bill records from CSV or JSON Lines files.
+
+Both formats carry the columns title, amount, date, split_method, paid_by (the payer's
+nickname) and an optional split_values field (older files call it percentages). In CSV,
+split_values is written as "ann:50;bob:50", or "ann;bob" to share an Equal split among
+some members; in JSON Lines it can be an object ({"ann": 50, "bob": 50}), a list of
+[nickname, value] pairs or a list of nicknames. Lines that cannot be parsed are yielded as a record
+with only an "error" message, so the importer can report them and carry on.
+"""
+import csv
+import json
+import os
+
+
+def parse_split_values(value):
+    """Turn the split_values field of a record into nicknames or (nickname, value) pairs."""
+    if not value:
+        return None
+    if isinstance(value, dict):
+        return [(nickname, float(amount)) for nickname, amount in value.items()]
+    if isinstance(value, list):
+        return [entry if isinstance(entry, str) else (entry[0], float(entry[1])) for entry in value]
+
+    entries = []
+    for part in value.split(";"):
+        nickname, separator, amount = part.partition(":")
+        entries.append((nickname.strip(), float(amount)) if separator else nickname.strip())
+    return entries
+
+
+def read_csv(f):
+    for line_number, record in enumerate(csv.DictReader(f), start=2):
+        yield line_number, record
+
+
+def read_jsonl(f):
+    for line_number, line in enumerate(f, start=1):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, {"error": f"Invalid JSON: {e}"}
+                continue
+            yield line_number, record if isinstance(record, dict) else {"error": "Expected a JSON object"}
+
+
+def read_bill_rows(path):
+    """Yield (line_number, record) for every bill in a .csv or .jsonl file, one at a time."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        reader = read_csv
+    elif extension in (".jsonl", ".ndjson"):
+        reader = read_jsonl
+    else:
+        raise ValueError(f"Unsupported file type '{extension}', expected .csv or .jsonl.")
+
+    with open(path, newline="", encoding="utf-8") as f:
+        for line_number, record in reader(f):
+            if "error" in record:
+                yield line_number, record
+                continue
+            try:
+                record["split_values"] = parse_split_values(record.get("split_values") or record.get("percentages"))
+            except (TypeError, ValueError) as e:
+                record = {"error": str(e)}
+            yield line_number, record
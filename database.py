@@ -1,61 +1,449 @@
+import atexit
+import os
+import queue
+import random
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+
+import profiling
+from dates import normalize_date
+from identity import IdentityCache
+from result_cache import ResultCache
+from rows import row_factory
+
+DEFAULT_DB_PATH = "splitwise.db"
+# Page cache per connection in KiB (a negative cache_size is read by SQLite as KiB)
+CACHE_SIZE_KIB = 16 * 1024
+# How long a connection waits for another writer's lock before SQLite reports it busy
+BUSY_TIMEOUT_MS = int(os.environ.get("XSPLITTR_BUSY_TIMEOUT_MS", 5000))
+# Extra attempts, with exponential backoff from RETRY_BACKOFF seconds, once the busy timeout has run out
+WRITE_RETRIES = 3
+RETRY_BACKOFF = 0.05
+
+
+def normalize_bill_dates(conn):
+    """Rewrite the dates of existing bills as YYYY-MM-DD.
+
+    Dates that cannot be parsed are left as they are; they sort outside every date window.
+    """
+    updates = []
+    for bill_id, value in conn.execute("SELECT id, date FROM bills"):
+        try:
+            normalized = normalize_date(value)
+        except ValueError:
+            continue
+        if normalized != value:
+            updates.append((normalized, bill_id))
+    conn.executemany("UPDATE bills SET date = ? WHERE id = ?", updates)
+
+
+# Schema migrations, applied in order. PRAGMA user_version records how many have
+# been applied, so an up-to-date database runs no DDL at all on startup. A step is
+# an SQL statement or a function called with the connection, for data migrations.
+MIGRATIONS = [
+    # 1: base tables
+    [
+        """
+        CREATE TABLE IF NOT EXISTS groups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS participants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            nickname TEXT UNIQUE NOT NULL,
+            group_id INTEGER NOT NULL,
+            FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS bills (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            split_method TEXT NOT NULL,
+            paid_by INTEGER NOT NULL,
+            group_id INTEGER NOT NULL,
+            FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS bill_splits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bill_id INTEGER NOT NULL,
+            participant_id INTEGER NOT NULL,
+            amount REAL NOT NULL CHECK (amount >= 0),
+            FOREIGN KEY (bill_id) REFERENCES bills(id) ON DELETE CASCADE,
+            FOREIGN KEY (participant_id) REFERENCES participants(id) ON DELETE CASCADE
+        )
+        """,
+    ],
+    # 2: covering indexes for the per-group, per-bill and per-participant lookups
+    [
+        "CREATE INDEX IF NOT EXISTS idx_participants_group ON participants (group_id, nickname)",
+        "CREATE INDEX IF NOT EXISTS idx_bills_group ON bills (group_id, paid_by, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_bill_splits_bill ON bill_splits (bill_id, participant_id, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_bill_splits_participant ON bill_splits (participant_id, amount)",
+    ],
+    # 3: per-participant balances kept up to date by triggers in the writing transaction
+    [
+        """
+        CREATE TABLE IF NOT EXISTS participant_balances (
+            participant_id INTEGER PRIMARY KEY,
+            group_id INTEGER NOT NULL,
+            balance REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY (participant_id) REFERENCES participants(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_participant_balances_group ON participant_balances (group_id, balance)",
+        """
+        INSERT OR REPLACE INTO participant_balances (participant_id, group_id, balance)
+        SELECT p.id, p.group_id, COALESCE(paid.total, 0.0) - COALESCE(owed.total, 0.0)
+        FROM participants p
+        LEFT JOIN (SELECT paid_by, SUM(amount) AS total FROM bills GROUP BY paid_by) paid
+            ON paid.paid_by = p.id
+        LEFT JOIN (SELECT participant_id, SUM(amount) AS total FROM bill_splits GROUP BY participant_id) owed
+            ON owed.participant_id = p.id
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS participants_balance_insert AFTER INSERT ON participants
+        BEGIN
+            INSERT INTO participant_balances (participant_id, group_id, balance) VALUES (NEW.id, NEW.group_id, 0);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bills_balance_insert AFTER INSERT ON bills
+        BEGIN
+            UPDATE participant_balances SET balance = balance + NEW.amount WHERE participant_id = NEW.paid_by;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bills_balance_delete AFTER DELETE ON bills
+        BEGIN
+            UPDATE participant_balances SET balance = balance - OLD.amount WHERE participant_id = OLD.paid_by;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bills_balance_update AFTER UPDATE OF amount, paid_by ON bills
+        BEGIN
+            UPDATE participant_balances SET balance = balance - OLD.amount WHERE participant_id = OLD.paid_by;
+            UPDATE participant_balances SET balance = balance + NEW.amount WHERE participant_id = NEW.paid_by;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bill_splits_balance_insert AFTER INSERT ON bill_splits
+        BEGIN
+            UPDATE participant_balances SET balance = balance - NEW.amount WHERE participant_id = NEW.participant_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bill_splits_balance_delete AFTER DELETE ON bill_splits
+        BEGIN
+            UPDATE participant_balances SET balance = balance + OLD.amount WHERE participant_id = OLD.participant_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bill_splits_balance_update AFTER UPDATE OF amount, participant_id ON bill_splits
+        BEGIN
+            UPDATE participant_balances SET balance = balance + OLD.amount WHERE participant_id = OLD.participant_id;
+            UPDATE participant_balances SET balance = balance - NEW.amount WHERE participant_id = NEW.participant_id;
+        END
+        """,
+    ],
+    # 4: walk a group's bills in id order for the paged bill table
+    [
+        "CREATE INDEX IF NOT EXISTS idx_bills_group_id ON bills (group_id, id)",
+    ],
+    # 5: per-group data version, bumped by every bill and participant write, and computed
+    # results cached against it (see result_cache.py). Splits are only inserted or deleted
+    # together with their bill, whose trigger already bumps the version, so only direct
+    # updates of a split need their own trigger.
+    [
+        "ALTER TABLE groups ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0",
+        """
+        CREATE TABLE IF NOT EXISTS settlement_cache (
+            group_id INTEGER NOT NULL,
+            cache_key TEXT NOT NULL,
+            data_version INTEGER NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (group_id, cache_key),
+            FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bills_version_insert AFTER INSERT ON bills
+        BEGIN
+            UPDATE groups SET data_version = data_version + 1 WHERE id = NEW.group_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bills_version_delete AFTER DELETE ON bills
+        BEGIN
+            UPDATE groups SET data_version = data_version + 1 WHERE id = OLD.group_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bills_version_update AFTER UPDATE ON bills
+        BEGIN
+            UPDATE groups SET data_version = data_version + 1 WHERE id IN (OLD.group_id, NEW.group_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bill_splits_version_update AFTER UPDATE ON bill_splits
+        BEGIN
+            UPDATE groups SET data_version = data_version + 1 WHERE id IN (SELECT group_id FROM bills WHERE id IN (OLD.bill_id, NEW.bill_id));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS participants_version_insert AFTER INSERT ON participants
+        BEGIN
+            UPDATE groups SET data_version = data_version + 1 WHERE id = NEW.group_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS participants_version_delete AFTER DELETE ON participants
+        BEGIN
+            UPDATE groups SET data_version = data_version + 1 WHERE id = OLD.group_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS participants_version_update AFTER UPDATE ON participants
+        BEGIN
+            UPDATE groups SET data_version = data_version + 1 WHERE id IN (OLD.group_id, NEW.group_id);
+        END
+        """,
+    ],
+    # 6: full-text index over bill titles. bills_fts is an external-content FTS5 table, so
+    # it stores only the index and reads titles from bills; triggers keep it in sync and the
+    # rebuild indexes the bills that already exist.
+    [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS bills_fts USING fts5(
+            title, content='bills', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bills_fts_insert AFTER INSERT ON bills
+        BEGIN
+            INSERT INTO bills_fts (rowid, title) VALUES (NEW.id, NEW.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bills_fts_delete AFTER DELETE ON bills
+        BEGIN
+            INSERT INTO bills_fts (bills_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS bills_fts_update AFTER UPDATE OF id, title ON bills
+        BEGIN
+            INSERT INTO bills_fts (bills_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+            INSERT INTO bills_fts (rowid, title) VALUES (NEW.id, NEW.title);
+        END
+        """,
+        "INSERT INTO bills_fts (bills_fts) VALUES ('rebuild')",
+    ],
+    # 7: ISO dates and an index for date windows of a group; it also covers payer and
+    # amount, so the amounts paid in a window are summed from the index alone
+    [
+        normalize_bill_dates,
+        "CREATE INDEX IF NOT EXISTS idx_bills_group_date ON bills (group_id, date, paid_by, amount)",
+    ],
+    # 8: per-group members version, bumped only by participant writes, so cached member
+    # maps (see identity.py) survive bill writes
+    [
+        "ALTER TABLE groups ADD COLUMN members_version INTEGER NOT NULL DEFAULT 0",
+        """
+        CREATE TRIGGER IF NOT EXISTS participants_members_insert AFTER INSERT ON participants
+        BEGIN
+            UPDATE groups SET members_version = members_version + 1 WHERE id = NEW.group_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS participants_members_delete AFTER DELETE ON participants
+        BEGIN
+            UPDATE groups SET members_version = members_version + 1 WHERE id = OLD.group_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS participants_members_update AFTER UPDATE ON participants
+        BEGIN
+            UPDATE groups SET members_version = members_version + 1 WHERE id IN (OLD.group_id, NEW.group_id);
+        END
+        """,
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+_db_path = os.environ.get("XSPLITTR_DB", DEFAULT_DB_PATH)
+_shared_databases = {}
+
+
+def set_db_path(path):
+    """Set the database file used by get_database() when no path is given."""
+    global _db_path
+    _db_path = path
+
+
+def get_db_path():
+    return _db_path
+
+
+def get_database(db_name=None):
+    """Return the shared Database for db_name, opening it on first use.
+
+    All managers created without an explicit database share this connection, so the
+    connection settings and schema check run once per file and process.
+    """
+    db_name = db_name or _db_path
+    if db_name not in _shared_databases:
+        _shared_databases[db_name] = Database(db_name)
+    return _shared_databases[db_name]
+
+
+def close_databases():
+    """Close every shared connection."""
+    for db in _shared_databases.values():
+        db.close_connection()
+    _shared_databases.clear()
+
+
+atexit.register(close_databases)
+
 
 class Database:
-    def __init__(self, db_name="splitwise.db"):
-        self.db_name = db_name
-        self.conn = sqlite3.connect(self.db_name)
-        self.conn.execute("PRAGMA foreign_keys = ON;")
+    def __init__(self, db_name=None, read_only=False, busy_timeout=None, retries=WRITE_RETRIES):
+        """Open db_name, or with read_only=True open it without write access or schema changes.
+
+        busy_timeout is in milliseconds (default BUSY_TIMEOUT_MS); retries is how many more
+        times a write is attempted after SQLite still reports the database as busy.
+        """
+        self.db_name = db_name or _db_path
+        self.read_only = read_only
+        self.busy_timeout = BUSY_TIMEOUT_MS if busy_timeout is None else busy_timeout
+        self.retries = retries
+        self._transaction_depth = 0
+        factory = profiling.connection_factory()
+        if read_only:
+            self.conn = sqlite3.connect(f"{Path(self.db_name).resolve().as_uri()}?mode=ro", uri=True,
+                                        timeout=self.busy_timeout / 1000, factory=factory)
+        else:
+            self.conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout / 1000, factory=factory)
+        self.configure_connection()
         self.cursor = self.conn.cursor()
-        self.initialize_tables()
+        self.identity = IdentityCache(self)
+        self.results = ResultCache(self)
+        if not read_only:
+            self.initialize_tables()
+
+    def configure_connection(self):
+        """Apply the per-connection settings."""
+        self.conn.execute("PRAGMA foreign_keys = ON;")
+        if self.read_only:
+            self.conn.execute("PRAGMA query_only = ON;")
+        else:
+            if self.conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+                # A new file: auto_vacuum can only be set before WAL mode and the first table,
+                # and lets archiving hand freed pages back (see ArchiveManager.compact)
+                self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+            self._retry_busy(self.conn.execute, "PRAGMA journal_mode = WAL;")
+        self.conn.execute("PRAGMA synchronous = NORMAL;")
+        self.conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB};")
+        self.conn.execute("PRAGMA temp_store = MEMORY;")
 
     def initialize_tables(self):
-        """Initialize all necessary tables in the database."""
-        with self.conn:
-            self.conn.execute("""
-                CREATE TABLE IF NOT EXISTS groups (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL
-                )
-            """)
-            self.conn.execute("""
-                CREATE TABLE IF NOT EXISTS participants (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    first_name TEXT NOT NULL,
-                    last_name TEXT NOT NULL,
-                    nickname TEXT UNIQUE NOT NULL,
-                    group_id INTEGER NOT NULL,
-                    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
-                )
-            """)
-            self.conn.execute("""
-                CREATE TABLE IF NOT EXISTS bills (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    date TEXT NOT NULL,
-                    split_method TEXT NOT NULL,
-                    paid_by INTEGER NOT NULL,
-                    group_id INTEGER NOT NULL,
-                    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
-                )
-            """)
-            self.conn.execute("""
-                CREATE TABLE IF NOT EXISTS bill_splits (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    bill_id INTEGER NOT NULL,
-                    participant_id INTEGER NOT NULL,
-                    amount REAL NOT NULL CHECK (amount >= 0),
-                    FOREIGN KEY (bill_id) REFERENCES bills(id) ON DELETE CASCADE,
-                    FOREIGN KEY (participant_id) REFERENCES participants(id) ON DELETE CASCADE
-                )
-            """)
+        """Bring the schema up to date, applying only the migrations that have not run yet."""
+        if self.schema_version() == SCHEMA_VERSION:
+            return
+        with self.transaction():
+            # Re-read under the write lock in case another connection migrated meanwhile
+            version = self.schema_version()
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                for statement in migration:
+                    if callable(statement):
+                        statement(self.conn)
+                    else:
+                        self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version = {number}")
+
+    def schema_version(self):
+        """Return the number of migrations applied to this database."""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def explain(self, query, params=None):
+        """Return the EXPLAIN QUERY PLAN details for a query."""
+        return [row[3] for row in self.conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ())]
 
     def execute_query(self, query, params=None):
-        """Execute a single query."""
-        with self.conn:
-            self.cursor.execute(query, params or ())
-            self.conn.commit()
-        return self.cursor
+        """Execute a single query in its own transaction."""
+        with self.transaction() as cursor:
+            cursor.execute(query, params or ())
+        return cursor
+
+    def execute_many(self, query, params_seq):
+        """Execute a query once for every parameter tuple in a single transaction."""
+        with self.transaction() as cursor:
+            cursor.executemany(query, params_seq)
+        return cursor
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of statements in one write transaction, rolling back on error.
+
+        The write lock is taken up front with BEGIN IMMEDIATE, retrying while another
+        connection holds it, so statements inside the block never fail as busy halfway
+        through. Nested blocks become savepoints of the enclosing transaction.
+        """
+        if self._transaction_depth:
+            savepoint = f"nested_{self._transaction_depth}"
+            self.conn.execute(f"SAVEPOINT {savepoint}")
+            self._transaction_depth += 1
+            try:
+                yield self.conn.cursor()
+            except BaseException:
+                self.conn.execute(f"ROLLBACK TO {savepoint}")
+                raise
+            finally:
+                self._transaction_depth -= 1
+                self.conn.execute(f"RELEASE {savepoint}")
+            return
+
+        self._retry_busy(self.conn.execute, "BEGIN IMMEDIATE")
+        self._transaction_depth = 1
+        try:
+            yield self.conn.cursor()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            try:
+                self._retry_busy(self.conn.commit)
+            except BaseException:
+                # Still busy after the retries: end the transaction rather than leave it open
+                self.conn.rollback()
+                raise
+        finally:
+            self._transaction_depth = 0
+
+    def _retry_busy(self, operation, *args):
+        """Run operation, retrying with exponential backoff while the database is busy."""
+        for attempt in range(self.retries + 1):
+            try:
+                return operation(*args)
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == self.retries:
+                    raise
+                time.sleep(RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
 
     def fetch_one(self, query, params=None):
         """Fetch a single result from a query."""
@@ -67,6 +455,123 @@ class Database:
         self.cursor.execute(query, params or ())
         return self.cursor.fetchall()
 
+    def fetch_objects(self, query, params=None, row_type=None):
+        """Fetch all results from a query as row_type instances (see rows.py)."""
+        cursor = self.conn.cursor()
+        cursor.row_factory = row_factory(row_type)
+        try:
+            return cursor.execute(query, params or ()).fetchall()
+        finally:
+            cursor.close()
+
+    def iter_rows(self, query, params=None, batch_size=1000, row_type=None):
+        """Yield the results of a query in batches of batch_size rows, never holding them all.
+
+        Rows are tuples, or row_type instances when a row_type is given.
+        """
+        cursor = self.conn.cursor()
+        if row_type:
+            cursor.row_factory = row_factory(row_type)
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
     def close_connection(self):
         """Close the database connection."""
         self.conn.close()
+
+
+def is_busy_error(error):
+    """Return True if a sqlite3 error means another connection holds a conflicting lock."""
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+
+class WriteQueue:
+    """Single writer thread that groups writes from many producers into shared transactions.
+
+    submit(fn, *args) queues fn(db, *args) and returns a Future. The writer thread owns
+    the only Database it uses; it takes whatever jobs are waiting (up to max_batch) and
+    runs them in one transaction, each in its own savepoint, so a failing job is rolled
+    back alone. Futures resolve once the shared transaction has committed.
+    """
+
+    def __init__(self, db_name=None, max_batch=100, **database_options):
+        self.db_name = db_name or _db_path
+        self.max_batch = max_batch
+        self.database_options = database_options
+        self.jobs = queue.Queue()
+        self.ready = Future()
+        self.thread = threading.Thread(target=self._run, name="xsplittr-write-queue", daemon=True)
+        self.thread.start()
+        # Surface connection or migration errors to the caller
+        self.ready.result()
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.jobs.put((future, fn, args))
+        return future
+
+    def call(self, fn, *args):
+        """Queue fn(db, *args) and wait for its result."""
+        return self.submit(fn, *args).result()
+
+    def close(self):
+        """Finish the queued writes and close the writer connection."""
+        self.jobs.put(None)
+        self.thread.join()
+
+    def _run(self):
+        try:
+            db = Database(self.db_name, **self.database_options)
+        except Exception as e:
+            self.ready.set_exception(e)
+            return
+        self.ready.set_result(True)
+
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self.jobs.get()]
+                while len(batch) < self.max_batch and not self.jobs.empty():
+                    batch.append(self.jobs.get())
+                if None in batch:
+                    stopping = True
+                    batch = [job for job in batch if job is not None]
+                if batch:
+                    self._write_batch(db, batch)
+        finally:
+            db.close_connection()
+
+    def _write_batch(self, db, batch):
+        results = []
+        try:
+            with db.transaction():
+                for future, fn, args in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with db.transaction():
+                            results.append((future, fn(db, *args), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            # The shared transaction failed to begin or commit; none of the batch was written
+            for future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
@@ -0,0 +1,40 @@
+"""Bill dates are stored as ISO 8601 days (YYYY-MM-DD), so they sort and compare as text
+and a date window is a range scan of the (group_id, date) index.
+
+Dates are accepted in the forms people type them here: ISO, or day first as in
+31.12.2024, 31/12/2024 and 31-12-2024. Month-first dates are not supported.
+"""
+from datetime import date, datetime
+
+DATE_FORMATS = ["%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%Y.%m.%d", "%d.%m.%y"]
+
+
+def normalize_date(value):
+    """Return value as a YYYY-MM-DD string, or raise ValueError if it is not a valid date."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+
+    text = str(value or "").strip()
+    if len(text) > 10 and text[10] in "T ":
+        # A timestamp such as 2024-05-01T12:30:00 keeps only its day
+        try:
+            return datetime.fromisoformat(text).date().isoformat()
+        except ValueError:
+            pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD or DD.MM.YYYY.")
+
+
+def date_window(start=None, end=None):
+    """Return the normalized (start, end) of an inclusive date window; either end may be open (None)."""
+    start = normalize_date(start) if start else None
+    end = normalize_date(end) if end else None
+    if start and end and start > end:
+        raise ValueError(f"The start date {start} is after the end date {end}.")
+    return start, end
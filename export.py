@@ -0,0 +1,107 @@
+import csv
+import itertools
+import json
+
+from database import get_database
+from group import GroupNotFoundError
+
+
+class ExportManager:
+    """Stream the ledger out of the database with constant memory."""
+
+    TABLES = ["groups", "bills", "splits"]
+
+    def __init__(self, db=None):
+        self.db = db or get_database()
+
+    def iter_table(self, table, group_name=None, batch_size=1000):
+        """Return (columns, rows) for one ledger table, optionally limited to a group.
+
+        The queries walk groups, then each group's bills (idx_bills_group_id), then each
+        bill's splits (idx_bill_splits_bill), so rows come out in index order without a
+        sort and the first row is ready immediately.
+        """
+        params = {}
+        group_filter = ""
+        if group_name is not None:
+            group_id = self.db.identity.group_id(group_name)
+            if not group_id:
+                raise GroupNotFoundError(group_name)
+            params["group_id"] = group_id
+            group_filter = "WHERE g.id = :group_id"
+
+        if table == "groups":
+            columns = ["id", "name"]
+            query = f"SELECT g.id, g.name FROM groups g {group_filter} ORDER BY g.id"
+        elif table == "bills":
+            columns = ["id", "group", "title", "amount", "date", "split_method", "paid_by"]
+            query = f"""
+                SELECT b.id, g.name, b.title, b.amount, b.date, b.split_method, p.nickname
+                FROM groups g
+                CROSS JOIN bills b ON b.group_id = g.id
+                LEFT JOIN participants p ON p.id = b.paid_by
+                {group_filter}
+                ORDER BY g.id, b.id
+            """
+        elif table == "splits":
+            columns = ["bill_id", "group", "participant", "amount"]
+            query = f"""
+                SELECT bs.bill_id, g.name, p.nickname, bs.amount
+                FROM groups g
+                CROSS JOIN bills b ON b.group_id = g.id
+                CROSS JOIN bill_splits bs ON bs.bill_id = b.id
+                JOIN participants p ON p.id = bs.participant_id
+                {group_filter}
+                ORDER BY g.id, b.id
+            """
+        else:
+            raise ValueError(f"Unknown table '{table}', expected one of {', '.join(self.TABLES)}.")
+
+        return columns, self.db.iter_rows(query, params, batch_size)
+
+
+def write_csv(out, columns, rows):
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    writer.writerows(rows)
+
+
+def write_jsonl(out, columns, rows, record_type=None):
+    for row in rows:
+        record = dict(zip(columns, row))
+        if record_type:
+            record = {"type": record_type, **record}
+        out.write(json.dumps(record) + "\n")
+
+
+def write_json(out, columns, rows):
+    """Write the rows as a JSON array of objects, one row at a time."""
+    out.write("[")
+    for i, row in enumerate(rows):
+        out.write(("," if i else "") + "\n  " + json.dumps(dict(zip(columns, row))))
+    out.write("\n]\n")
+
+
+def write_table(out, columns, rows, width=14):
+    """Write the rows as an aligned text table without reading them all first.
+
+    Columns are width characters wide (longer values overflow); numeric columns,
+    as seen in the first row, are right-aligned.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    numeric = [isinstance(value, (int, float)) for value in first] if first else [False] * len(columns)
+    out.write("  ".join(f"{column:>{width}}" if right else f"{column:<{width}}"
+                        for column, right in zip(columns, numeric)).rstrip() + "\n")
+    if first is None:
+        return
+    for row in itertools.chain([first], rows):
+        cells = []
+        for value in row:
+            if isinstance(value, float):
+                cells.append(f"{value:>{width}.2f}")
+            elif isinstance(value, int):
+                cells.append(f"{value:>{width}}")
+            else:
+                cells.append(f"{'' if value is None else value:<{width}}")
+        out.write("  ".join(cells).rstrip() + "\n")
@@ -1,17 +1,32 @@
-from database import Database
+from database import get_database
+from rows import Group
+
+
+class GroupNotFoundError(ValueError):
+    """Raised when a named group does not exist."""
+
+    def __init__(self, group_name):
+        super().__init__(f"Group '{group_name}' does not exist.")
+        self.group_name = group_name
+
 
 class GroupManager:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        self.db = db or get_database()
 
     def create_group(self, name):
         query = "INSERT INTO groups (name) VALUES (?)"
         self.db.execute_query(query, (name,))
 
     def delete_group(self, name):
+        group_id = self.db.identity.group_id(name)
+        if not group_id:
+            raise GroupNotFoundError(name)
         query = "DELETE FROM groups WHERE name = ?"
         self.db.execute_query(query, (name,))
+        self.db.identity.invalidate_group(name)
+        self.db.results.invalidate(group_id)
 
     def list_groups(self):
         query = "SELECT id, name FROM groups"
-        return self.db.fetch_all(query)
+        return self.db.fetch_objects(query, row_type=Group)
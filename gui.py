@@ -1,13 +1,21 @@
+import io
 import sys
 import sqlite3, qrcode
-from PyQt5.QtGui import QPixmap
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit, QListWidget, QWidget,
-    QMessageBox, QDialog, QTableWidget, QTableWidgetItem, QListWidgetItem, QComboBox, QDoubleSpinBox, QButtonGroup, QRadioButton
+    QMessageBox, QDialog, QTableView, QListWidgetItem, QComboBox, QDoubleSpinBox, QButtonGroup, QRadioButton,
+    QCheckBox
 )
+from database import close_databases
 from group import GroupManager
+from archive import ArchiveManager
 from bill import BillManager
 from participant import ParticipantManager
+from settlement import format_settlement
+from workers import DatabaseWorker, Worker, start_worker
 
 
 class ExpenseSplitterApp(QMainWindow):
@@ -28,6 +36,7 @@ class ExpenseSplitterApp(QMainWindow):
 
         # Group List Display
         self.group_list_widget = QListWidget()
+        self.group_list_widget.itemDoubleClicked.connect(self.open_group_management_window)
         self.main_layout.addWidget(self.group_list_widget)
 
         # Add Delete Group Button
@@ -86,14 +95,12 @@ class ExpenseSplitterApp(QMainWindow):
             self.group_list_widget.clear()
 
             for group in groups:
-                group_name = group[1]
+                group_name = group.name
                 item = f"{group_name} (Double-click to manage)"
                 list_item = QListWidgetItem(item)
                 list_item.setData(0, group_name)
                 self.group_list_widget.addItem(list_item)
 
-            self.group_list_widget.itemDoubleClicked.connect(self.open_group_management_window)
-
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
 
@@ -102,6 +109,7 @@ class ExpenseSplitterApp(QMainWindow):
         group_name = item.data(0)
         group_window = GroupManagementWindow(group_name)
         group_window.exec_()
+        self.update_group_list()
 
     def close_application(self):
         """Close the entire application."""
@@ -213,24 +221,25 @@ class GroupManagementWindow(QDialog):
             QMessageBox.critical(self, "Error", f"An unexpected error occurred: {str(e)}")
 
     def update_participant_list(self):
-        """Update the list of participants for the group."""
-        try:
-            participants = self.participant_manager.db.fetch_all("""
-                SELECT first_name, last_name, nickname 
-                FROM participants 
-                WHERE group_id = (SELECT id FROM groups WHERE name = ?)
-            """, (self.group_name,))
-
-            self.participant_list_widget.clear()
-            for participant in participants:
-                participant_display = f"{participant[0]} {participant[1]} ({participant[2]})"  # Include nickname
-                self.participant_list_widget.addItem(participant_display)
+        """Reload the list of participants for the group in the background."""
+        self.participant_list_widget.clear()
+        self.participant_list_widget.addItem("Loading participants...")
+        self.participant_list_widget.setEnabled(False)
+        start_worker(
+            DatabaseWorker(lambda db: ParticipantManager(db).list_participants(self.group_name)),
+            on_result=self.show_participants,
+            on_error=lambda error: QMessageBox.critical(self, "Error", error),
+        )
 
-            if participants:
-                self.add_bill_button.setEnabled(True)
+    def show_participants(self, participants):
+        self.participant_list_widget.clear()
+        self.participant_list_widget.setEnabled(True)
+        for participant in participants:
+            participant_display = f"{participant.first_name} {participant.last_name} ({participant.nickname})"
+            self.participant_list_widget.addItem(participant_display)
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        if participants:
+            self.add_bill_button.setEnabled(True)
 
     def delete_participant(self):
         """Delete a participant from the group."""
@@ -259,7 +268,135 @@ class GroupManagementWindow(QDialog):
     def open_bill_management_window(self):
         """Open a new window to manage bills for the selected group."""
         bill_window = BillManagementWindow(self.group_name)
-        bill_window.exec_()
+        if bill_window.exec_() == QDialog.Accepted:
+            self.accept()
+
+
+class BillTableModel(QAbstractTableModel):
+    """Bills of one group, loaded page by page as the view scrolls, or the matches of a search."""
+
+    HEADERS = ["Title", "Amount", "Date", "Split Method", "Group", "Split Details"]
+
+    loading_changed = pyqtSignal(bool)
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, bill_manager, group_name, page_size=200):
+        super().__init__()
+        self.bill_manager = bill_manager
+        self.group_name = group_name
+        self.page_size = page_size
+        self.rows = []
+        self.exhausted = False
+        self.loading = False
+        self.generation = 0
+        self.search_text = ""
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        bill = self.rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return bill.title
+        if column == 1:
+            return f"CHF {bill.amount:.2f}"
+        if column == 2:
+            return bill.date
+        if column == 3:
+            return bill.split_method
+        if column == 4:
+            return self.group_name
+        if bill.split_method not in BillManager.SPLIT_METHODS:
+            return "Custom or unsupported split method"
+        return bill.split_details or "No participants"
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Load the next page on the thread pool; rows are added when it arrives."""
+        if parent.isValid() or self.loading:
+            return
+        after_id = self.rows[-1].id if self.rows else 0
+        generation = self.generation
+        search_text = self.search_text
+        if search_text:
+            # Search results come ranked in a single page
+            load = lambda db: BillManager(db).search_bills(self.group_name, search_text, self.page_size)
+        else:
+            load = lambda db: BillManager(db).get_bill_page(self.group_name, after_id, self.page_size)
+        self.set_loading(True)
+        start_worker(
+            DatabaseWorker(load),
+            on_result=lambda page: self.add_page(page, generation),
+            on_error=self.load_failed.emit,
+            on_finished=lambda: self.page_finished(generation),
+        )
+
+    def page_finished(self, generation):
+        # A page of an earlier generation must not end the loading of the current one
+        if generation == self.generation:
+            self.set_loading(False)
+
+    def add_page(self, page, generation):
+        if generation != self.generation:
+            return  # The model was reloaded while this page was loading
+        if len(page) < self.page_size or self.search_text:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def set_loading(self, loading):
+        self.loading = loading
+        self.loading_changed.emit(loading)
+
+    def reload(self):
+        self.beginResetModel()
+        self.generation += 1
+        self.rows = []
+        self.exhausted = False
+        self.loading = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def set_search(self, text):
+        """Show only the bills matching text, or every bill again when it is empty."""
+        text = text.strip()
+        if text != self.search_text:
+            self.search_text = text
+            self.reload()
+
+    def bill_id(self, row):
+        return self.rows[row].id
+
+    def append_bill(self, bill_id):
+        """Show a newly added bill; until the last page is loaded it arrives with fetchMore."""
+        if not self.exhausted or self.search_text:
+            return
+        bill = self.bill_manager.get_bill_row(bill_id)
+        if bill:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows))
+            self.rows.append(bill)
+            self.endInsertRows()
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        self.endRemoveRows()
 
 
 class BillManagementWindow(QDialog):
@@ -286,7 +423,9 @@ class BillManagementWindow(QDialog):
     def finish_trip(self):
         try:
             finish_trip_window = FinishTripWindow(self.group_name, self.bill_manager)
-            finish_trip_window.exec_()
+            if finish_trip_window.exec_() == QDialog.Accepted:
+                # The trip was archived, so there is nothing left to manage here
+                self.accept()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred while finishing the trip: {e}")
 
@@ -304,11 +443,11 @@ class BillManagementWindow(QDialog):
         self.bill_amount_input = QLineEdit()
         self.bill_amount_input.setPlaceholderText("Amount")
         self.bill_date_input = QLineEdit()
-        self.bill_date_input.setPlaceholderText("Date (YYYY-MM-DD)")
+        self.bill_date_input.setPlaceholderText("Date (YYYY-MM-DD or DD.MM.YYYY)")
 
         self.split_method_dropdown = QComboBox()
         self.split_method_dropdown.addItems(BillManager.SPLIT_METHODS)
-        self.split_method_dropdown.currentTextChanged.connect(self.toggle_percentage_input)
+        self.split_method_dropdown.currentTextChanged.connect(self.toggle_split_inputs)
 
         add_bill_btn = QPushButton("Add Bill")
         add_bill_btn.clicked.connect(self.add_bill)
@@ -322,11 +461,12 @@ class BillManagementWindow(QDialog):
         # Add bill input layout to the main layout
         self.layout.addLayout(bill_input_layout)
 
-        # Dynamic Percentage Input Section (Added below the bill input fields)
-        self.percentage_input_widget = QWidget()
-        self.percentage_input_layout = QVBoxLayout(self.percentage_input_widget)
+        # Per-participant split inputs (below the bill input fields): a checkbox to include
+        # the participant in an equal split, and a value for the other split methods
+        self.split_input_widget = QWidget()
+        self.split_input_layout = QVBoxLayout(self.split_input_widget)
 
-        self.percentage_inputs = []
+        self.split_inputs = []
 
         participants = self.bill_manager.db.fetch_all("""
             SELECT nickname as participant_name
@@ -342,33 +482,49 @@ class BillManagementWindow(QDialog):
             label.setFixedWidth(100)  # Align all labels neatly
             row_layout.addWidget(label)
 
-            # Add percentage input field
+            # Include checkbox and value field; the value's unit follows the split method
+            include_box = QCheckBox()
+            include_box.setChecked(True)
+            row_layout.addWidget(include_box)
             input_field = QDoubleSpinBox()
-            input_field.setSuffix("%")
-            input_field.setRange(0, 100)
             input_field.setDecimals(2)
             input_field.setSingleStep(1.0)
-            self.percentage_inputs.append((nickname, input_field))
+            self.split_inputs.append((nickname, include_box, input_field))
             row_layout.addWidget(input_field)
 
             # Align and compact the layout
             row_layout.setSpacing(20)  # Reduce spacing between label and input
             row_layout.setContentsMargins(0, 0, 0, 0)  # Remove unnecessary margins
 
-            # Add the row layout to the main percentage input layout
-            self.percentage_input_layout.addLayout(row_layout)
+            # Add the row layout to the main split input layout
+            self.split_input_layout.addLayout(row_layout)
 
-        # Add percentage input widget directly below the bill input layout
-        self.layout.addWidget(self.percentage_input_widget)
-        self.percentage_input_widget.setVisible(False)  # Hidden by default
+        # Add split input widget directly below the bill input layout
+        self.layout.addWidget(self.split_input_widget)
+        self.toggle_split_inputs(self.split_method_dropdown.currentText())
 
         # Table layout for displaying bills
         table_layout = QVBoxLayout()
-        self.bills_table = QTableWidget()
-        self.bills_table.setColumnCount(6)
-        self.bills_table.setHorizontalHeaderLabels(
-            ["Title", "Amount", "Date", "Split Method", "Group", "Split Details"]
-        )
+        self.bill_model = BillTableModel(self.bill_manager, self.group_name)
+        self.bill_model.load_failed.connect(
+            lambda error: QMessageBox.critical(self, "Error", f"An error occurred while updating the table: {error}"))
+        self.bills_loading_label = QLabel("Loading bills...")
+        self.bills_loading_label.setVisible(False)
+        self.bill_model.loading_changed.connect(self.bills_loading_label.setVisible)
+        table_layout.addWidget(self.bills_loading_label)
+        self.bill_search_input = QLineEdit()
+        self.bill_search_input.setPlaceholderText("Search bills by title")
+        # Search once typing pauses instead of on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(lambda: self.bill_model.set_search(self.bill_search_input.text()))
+        self.bill_search_input.textChanged.connect(self.search_timer.start)
+        table_layout.addWidget(self.bill_search_input)
+        self.bills_table = QTableView()
+        self.bills_table.setModel(self.bill_model)
+        self.bills_table.setSelectionBehavior(QTableView.SelectRows)
+        self.bills_table.setSelectionMode(QTableView.SingleSelection)
         table_layout.addWidget(self.bills_table)
 
         delete_bill_btn = QPushButton("Delete Bill")
@@ -378,11 +534,15 @@ class BillManagementWindow(QDialog):
         # Add the table layout to the main layout
         self.layout.addLayout(table_layout)
 
-    def toggle_percentage_input(self, method):
-        if method.lower() == "percentage":
-            self.percentage_input_widget.setVisible(True)
-        else:
-            self.percentage_input_widget.setVisible(False)
+    def toggle_split_inputs(self, method):
+        """Show the include checkboxes for equal splits and a value field with the right unit otherwise."""
+        suffix, maximum = {"Percentage": ("%", 100), "Shares": (" shares", 1000),
+                           "Exact": (" CHF", 1_000_000)}.get(method, ("", 0))
+        for _, include_box, input_field in self.split_inputs:
+            include_box.setVisible(method == "Equal")
+            input_field.setVisible(method != "Equal")
+            input_field.setSuffix(suffix)
+            input_field.setRange(0, maximum)
 
     def add_bill(self):
         title = self.bill_title_input.text()
@@ -396,27 +556,29 @@ class BillManagementWindow(QDialog):
 
         try:
             amount = float(amount)
+        except ValueError:
+            QMessageBox.critical(self, "Error", "Amount must be a valid number.")
+            return
 
+        try:
             # Select payer once
             payer_id = self.select_payer()
             if payer_id is None:
                 QMessageBox.warning(self, "Error", "No payer selected.")
                 return
 
-            percentages = None
-
-            if split_method.lower() == "percentage":
-                percentages = []
-                for nickname, input_field in self.percentage_inputs:
-                    percentage = input_field.value()
-                    percentages.append((nickname, percentage))
-
-                total_percentage = sum(p[1] for p in percentages)
-                if abs(total_percentage - 100) > 0.01:
-                    QMessageBox.warning(self, "Error", "Percentages must total 100%.")
+            if split_method == "Equal":
+                split_values = [nickname for nickname, include_box, _ in self.split_inputs if include_box.isChecked()]
+                if not split_values:
+                    QMessageBox.warning(self, "Error", "Select at least one participant to split the bill.")
                     return
+            else:
+                # Participants left at zero are not part of the split
+                split_values = [(nickname, input_field.value()) for nickname, _, input_field in self.split_inputs
+                                if input_field.value() > 0]
 
-            self.bill_manager.add_bill(self.group_name, title, amount, date, split_method, percentages, payer_id)
+            bill_id = self.bill_manager.add_bill(self.group_name, title, amount, date, split_method, split_values,
+                                                 payer_id)
 
             QMessageBox.information(self, "Success", f"Bill '{title}' of CHF {amount:.2f} added.")
 
@@ -424,14 +586,14 @@ class BillManagementWindow(QDialog):
             self.bill_amount_input.clear()
             self.bill_date_input.clear()
 
-            if split_method.lower() == "percentage":
-                for _, input_field in self.percentage_inputs:
-                    input_field.setValue(0.0)
+            for _, include_box, input_field in self.split_inputs:
+                include_box.setChecked(True)
+                input_field.setValue(0.0)
 
-            self.update_bill_table()
+            self.bill_model.append_bill(bill_id)
 
-        except ValueError:
-            QMessageBox.critical(self, "Error", "Amount must be a valid number.")
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred: {e}")
 
@@ -443,66 +605,18 @@ class BillManagementWindow(QDialog):
 
     def update_bill_table(self):
         try:
-            self.bills_table.setRowCount(0)  # Clear the table
-
-            # Fetch all bills for the group
-            bills = self.bill_manager.db.fetch_all("""
-                SELECT b.id, b.title, b.amount, b.date, b.split_method, g.name
-                FROM bills b
-                JOIN groups g ON b.group_id = g.id
-                WHERE g.name = ?
-            """, (self.group_name,))
-
-            self.bill_ids = []  # Backend storage for bill IDs
-
-            for row, bill in enumerate(bills):
-                bill_id, title, amount, date, split_method, group_name = bill
-
-                # Store bill_id for backend use
-                self.bill_ids.append(bill_id)
-
-                # Populate the table
-                self.bills_table.insertRow(row)
-                self.bills_table.setItem(row, 0, QTableWidgetItem(title))
-                self.bills_table.setItem(row, 1, QTableWidgetItem(f"CHF {amount:.2f}"))
-                self.bills_table.setItem(row, 2, QTableWidgetItem(date))
-                self.bills_table.setItem(row, 3, QTableWidgetItem(split_method))
-                self.bills_table.setItem(row, 4, QTableWidgetItem(group_name))
-
-                # Add split details column
-                contributions = self.bill_manager.db.fetch_all("""
-                    SELECT p.nickname, bp.amount
-                    FROM bill_splits bp
-                    JOIN participants p ON bp.participant_id = p.id
-                    WHERE bp.bill_id = ?
-                """, (bill_id,))
-
-                if split_method.lower() == "equal":
-                    split_details = (
-                        ", ".join([f"{participant} Owes: CHF {amount:.2f}" for participant, amount in contributions])
-                        if contributions
-                        else "No participants"
-                    )
-                elif split_method.lower() == "percentage":
-                    split_details = ", ".join(
-                        [f"{participant} Owes: CHF {amount:.2f}" for participant, amount in contributions]
-                    )
-                else:
-                    split_details = "Custom or unsupported split method"
-
-                self.bills_table.setItem(row, 5, QTableWidgetItem(split_details))
-
+            self.bill_model.reload()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred while updating the table: {e}")
 
     def remove_bill(self):
-        selected_row = self.bills_table.currentRow()
+        selected_row = self.bills_table.currentIndex().row()
 
         if selected_row < 0:
             QMessageBox.warning(self, "Error", "Please select a bill to delete.")
             return
 
-        bill_id = self.bill_ids[selected_row]
+        bill_id = self.bill_model.bill_id(selected_row)
 
         try:
             confirm = QMessageBox.question(self, "Confirm", "Are you sure you want to delete this bill?",
@@ -511,7 +625,7 @@ class BillManagementWindow(QDialog):
             if confirm == QMessageBox.Yes:
                 self.bill_manager.remove_bill(bill_id)
                 QMessageBox.information(self, "Success", f"Bill has been deleted.")
-                self.update_bill_table()
+                self.bill_model.remove_row(selected_row)
 
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
@@ -592,6 +706,9 @@ class FinishTripWindow(QDialog):
 
         # Button Layout
         button_layout = QHBoxLayout()
+        self.archive_button = QPushButton("Archive Trip")
+        self.archive_button.clicked.connect(self.archive_trip)
+        button_layout.addWidget(self.archive_button)
         close_button = QPushButton("Close")
         close_button.clicked.connect(self.close)
         button_layout.addWidget(close_button)
@@ -602,77 +719,154 @@ class FinishTripWindow(QDialog):
         self.display_settlements()
 
     def display_settlements(self):
-        try:
-            settlements = self.bill_manager.calculate_settlements(self.group_name)
-            if settlements:
-                for settlement in settlements:
-                    self.settlements_list.addItem(settlement)
-            else:
-                self.settlements_list.addItem("No settlements required. All balances are settled.")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"An error occurred: {e}")
+        """Calculate the settlements in the background and list them when ready."""
+        self.settlements_list.clear()
+        self.settlements_list.addItem("Calculating settlements...")
+        start_worker(
+            DatabaseWorker(lambda db: BillManager(db).calculate_settlements(self.group_name, exact=True)),
+            on_result=self.show_settlements,
+            on_error=lambda error: QMessageBox.critical(self, "Error", f"An error occurred: {error}"),
+        )
+
+    def archive_trip(self):
+        """Move the finished trip into the archive database, off the live tables."""
+        confirm = QMessageBox.question(
+            self, "Confirm", f"Archive '{self.group_name}'? Its bills and settlements stay readable with "
+                             f"'python main.py archive show --group {self.group_name}'.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if confirm != QMessageBox.Yes:
+            return
+
+        self.archive_button.setEnabled(False)
+        start_worker(
+            DatabaseWorker(lambda db: ArchiveManager(db).archive_group(self.group_name)),
+            on_result=self.trip_archived,
+            on_error=self.archive_failed,
+        )
+
+    def trip_archived(self, settlements):
+        # The archive ran on its own connection; drop what the shared one cached about the group
+        group_id = self.bill_manager.db.identity.group_id(self.group_name)
+        self.bill_manager.db.identity.invalidate_group(self.group_name)
+        if group_id:
+            self.bill_manager.db.results.invalidate(group_id)
+        QMessageBox.information(self, "Success", f"Trip '{self.group_name}' has been archived.")
+        self.accept()
+
+    def archive_failed(self, error):
+        self.archive_button.setEnabled(True)
+        QMessageBox.critical(self, "Error", f"An error occurred while archiving the trip: {error}")
+
+    def show_settlements(self, settlements):
+        self.settlements_list.clear()
+        if settlements:
+            for settlement in settlements:
+                item = QListWidgetItem(format_settlement(settlement))
+                item.setData(Qt.UserRole, settlement)
+                self.settlements_list.addItem(item)
+        else:
+            self.settlements_list.addItem("No settlements required. All balances are settled.")
 
     def show_qr_code(self, item):
-        """Generate and display a QR code for the selected settlement."""
-        settlement_text = item.text()
+        """Render the QR code for the selected settlement in the background, then show it."""
+        settlement = item.data(Qt.UserRole)
+        if settlement is None:
+            return
 
-        # Extract payer and participant from settlement text
-        try:
-            participant, _, payer_details = settlement_text.partition(" owes ")
-            payer, _, amount = payer_details.partition(" ")
+        payer = settlement.creditor
+        amount = f"CHF {settlement.amount:.2f}"
+
+        # Example bank details or payment info
+        payment_info = f"Bank details for {payer}\nAmount: {amount}"
 
-            # Example bank details or payment info
-            payment_info = f"Bank details for {payer}\nAmount: CHF {amount.strip()}"
+        # Codes are cached by payee and amount, so reopening a settlement skips rendering
+        cache_key = (payer, settlement.amount)
+        pixmap = qr_code_cache.get(cache_key)
+        if pixmap is not None:
+            self.open_qr_dialog(payer, amount, pixmap)
+            return
 
-            # Generate QR code
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(payment_info)
-            qr.make(fit=True)
-            img = qr.make_image(fill="black", back_color="white")
+        self.settlements_list.setEnabled(False)
+        start_worker(
+            Worker(render_qr_code, payment_info),
+            on_result=lambda image: self.open_qr_dialog(
+                payer, amount, qr_code_cache.put(cache_key, QPixmap.fromImage(image))),
+            on_error=lambda error: QMessageBox.critical(self, "Error", f"Failed to generate QR code: {error}"),
+            on_finished=lambda: self.settlements_list.setEnabled(True),
+        )
 
-            # Save QR code as an image
-            qr_code_path = "temp_qr_code.png"
-            img.save(qr_code_path)
+    def open_qr_dialog(self, payer, amount, pixmap):
+        # Create the QR code dialog
+        qr_dialog = QDialog(self)
+        qr_dialog.setWindowTitle(f"Bank Details for {payer}")
+        qr_dialog.setGeometry(1650, 500, 400, 600)  # Adjusted size for extra labels and button
 
-            # Create the QR code dialog
-            qr_dialog = QDialog(self)
-            qr_dialog.setWindowTitle(f"Bank Details for {payer}")
-            qr_dialog.setGeometry(1650, 500, 400, 600)  # Adjusted size for extra labels and button
+        layout = QVBoxLayout()
 
-            layout = QVBoxLayout()
+        # Add a title label
+        title_label = QLabel(f"Bank Details for {payer}")
+        title_label.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 3px;")
+        layout.addWidget(title_label)
 
-            # Add a title label
-            title_label = QLabel(f"Bank Details for {payer}")
-            title_label.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 3px;")
-            layout.addWidget(title_label)
+        # Add an amount label
+        amount_label = QLabel(f"Amount to be paid: {amount}")
+        amount_label.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 10px;")
+        layout.addWidget(amount_label)
 
-            # Add an amount label
-            amount_label = QLabel(f"Amount to be paid: {amount.strip()}")
-            amount_label.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 10px;")
-            layout.addWidget(amount_label)
+        # Add the QR code image
+        label = QLabel()
+        label.setPixmap(pixmap)
+        label.setScaledContents(True)
+        layout.addWidget(label)
 
-            # Add the QR code image
-            label = QLabel()
-            pixmap = QPixmap(qr_code_path)
-            label.setPixmap(pixmap)
-            label.setScaledContents(True)
-            layout.addWidget(label)
+        # Add the "Close" button
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(qr_dialog.close)
+        layout.addWidget(close_button)
 
-            # Add the "Close" button
-            close_button = QPushButton("Close")
-            close_button.clicked.connect(qr_dialog.close)
-            layout.addWidget(close_button)
+        qr_dialog.setLayout(layout)
+        qr_dialog.exec_()
 
-            qr_dialog.setLayout(layout)
-            qr_dialog.exec_()
 
+class PixmapCache:
+    """Bounded least-recently-used cache of rendered pixmaps; use from the UI thread only."""
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to generate QR code: {e}")
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.pixmaps = OrderedDict()
+
+    def get(self, key):
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        self.pixmaps[key] = pixmap
+        self.pixmaps.move_to_end(key)
+        while len(self.pixmaps) > self.maxsize:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+
+
+qr_code_cache = PixmapCache()
+
+
+def render_qr_code(payment_info):
+    """Render a QR code for payment_info into a QImage in memory; safe to run off the UI thread."""
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(payment_info)
+    qr.make(fit=True)
+    img = qr.make_image(fill="black", back_color="white")
+
+    buffer = io.BytesIO()
+    img.save(buffer)
+    return QImage.fromData(buffer.getvalue(), "PNG")
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(close_databases)
     window = ExpenseSplitterApp()
     window.show()
     sys.exit(app.exec_())
@@ -0,0 +1,69 @@
+class IdentityCache:
+    """Cache of group name -> group id and (group, nickname) -> participant id lookups.
+
+    Each Database owns one, so all managers sharing a connection share it. Misses are
+    not cached, and writers on this connection invalidate only the entries they affect.
+    Other connections and processes write too: PRAGMA data_version, which reads no
+    table, changes when one of them commits, and only then are the cached entries
+    checked in one query against the groups' names and members_version, which triggers
+    bump on every participant write. Bill writes leave the cache alone.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.group_ids = {}
+        # group_id -> (members_version, {nickname: participant_id})
+        self.group_members = {}
+        self.data_version = None
+
+    def group_id(self, group_name):
+        self._drop_stale()
+        if group_name not in self.group_ids:
+            result = self.db.fetch_one("SELECT id FROM groups WHERE name = ?", (group_name,))
+            if not result:
+                return None
+            self.group_ids[group_name] = result[0]
+        return self.group_ids[group_name]
+
+    def members(self, group_id):
+        """Return {nickname: participant_id} for a group. The mapping is shared; do not modify it."""
+        self._drop_stale()
+        if group_id not in self.group_members:
+            # Version first: a participant written in between only makes the entry look stale
+            result = self.db.fetch_one("SELECT members_version FROM groups WHERE id = ?", (group_id,))
+            self.group_members[group_id] = (result[0] if result else None, dict(self.db.fetch_all(
+                "SELECT nickname, id FROM participants WHERE group_id = ?", (group_id,))))
+        return self.group_members[group_id][1]
+
+    def participant_id(self, group_id, nickname):
+        return self.members(group_id).get(nickname)
+
+    def _drop_stale(self):
+        """Drop the entries that another connection's commits have made stale."""
+        data_version = self.db.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.data_version:
+            return
+        self.data_version = data_version
+        if not self.group_ids and not self.group_members:
+            return
+
+        groups = {group_id: (name, members_version) for group_id, name, members_version
+                  in self.db.fetch_all("SELECT id, name, members_version FROM groups")}
+        for group_name, group_id in list(self.group_ids.items()):
+            if groups.get(group_id, (None,))[0] != group_name:
+                self.invalidate_group(group_name)
+        for group_id, (members_version, _) in list(self.group_members.items()):
+            if group_id not in groups or groups[group_id][1] != members_version:
+                del self.group_members[group_id]
+
+    def invalidate_group(self, group_name):
+        group_id = self.group_ids.pop(group_name, None)
+        if group_id is not None:
+            self.group_members.pop(group_id, None)
+
+    def invalidate_members(self, group_id):
+        self.group_members.pop(group_id, None)
+
+    def clear(self):
+        self.group_ids.clear()
+        self.group_members.clear()
@@ -0,0 +1,115 @@
+"""Load test for the local JSON API server.
+
+Start the server against a scratch database, then run:
+
+    python main.py --db /tmp/load.db serve --port 8765
+    python loadtest.py --port 8765 --clients 50 --requests 200
+
+Each client keeps one connection open and issues a mix of reads (bill pages,
+balances, settlements) and bill writes. Throughput and latency percentiles are
+reported per request kind.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from urllib.parse import quote
+
+
+async def request(reader, writer, method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def nickname(group, i):
+    # Nicknames are unique across the whole database, not per group
+    return f"{group} p{i}"
+
+
+async def setup(host, port, group, participants):
+    reader, writer = await asyncio.open_connection(host, port)
+    await request(reader, writer, "POST", "/groups", {"name": group})
+    for i in range(participants):
+        await request(reader, writer, "POST", f"/groups/{quote(group)}/participants",
+                      {"first_name": f"First{i}", "last_name": f"Last{i}", "nickname": nickname(group, i)})
+    writer.close()
+
+
+async def client(host, port, group, participants, count, write_ratio, rng, timings):
+    reader, writer = await asyncio.open_connection(host, port)
+    path_group = quote(group)
+    for _ in range(count):
+        roll = rng.random()
+        if roll < write_ratio:
+            kind, method, path = "add_bill", "POST", f"/groups/{path_group}/bills"
+            body = {"title": "Load test", "amount": round(rng.uniform(5, 300), 2), "date": "01.01.2025",
+                    "split_method": "Equal", "paid_by": nickname(group, rng.randrange(participants))}
+        elif roll < write_ratio + 0.1:
+            kind, method, path, body = "settlements", "GET", f"/groups/{path_group}/settlements", None
+        elif roll < write_ratio + 0.4:
+            kind, method, path, body = "balances", "GET", f"/groups/{path_group}/balances", None
+        else:
+            kind, method, path, body = "bill_page", "GET", f"/groups/{path_group}/bills?limit=50", None
+
+        start = time.perf_counter()
+        status, _ = await request(reader, writer, method, path, body)
+        timings.setdefault(kind, []).append((time.perf_counter() - start, status))
+    writer.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(args):
+    await setup(args.host, args.port, args.group, args.participants)
+    timings = {}
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, args.group, args.participants, args.requests, args.write_ratio,
+               random.Random(rng.random()), timings)
+        for _ in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(samples) for samples in timings.values())
+    print(f"{total} requests from {args.clients} clients in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+    print(f"{'kind':<12} {'count':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for kind, samples in sorted(timings.items()):
+        latencies = sorted(seconds * 1000 for seconds, _ in samples)
+        errors = sum(1 for _, status in samples if status >= 400)
+        print(f"{kind:<12} {len(samples):>7} {errors:>7} {statistics.median(latencies):>8.2f} "
+              f"{percentile(latencies, 0.95):>8.2f} {percentile(latencies, 0.99):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Xsplittr JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--group", default="Load Test")
+    parser.add_argument("--participants", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent connections")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Fraction of requests that add a bill")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,24 @@
 import argparse
+import json
+import os
+import sys
+from archive import ArchiveManager
+from bill_import import parse_split_values, read_bill_rows
+from database import set_db_path
+from dates import date_window
+from export import ExportManager, write_csv, write_json, write_jsonl, write_table
 from group import GroupManager
 from participant import ParticipantManager
 from bill import BillManager
+from report import ReportManager
+from settlement import format_settlement
+import profiling
+import server
 
 
 def main():
     parser = argparse.ArgumentParser(description="Xsplittr")
+    parser.add_argument("--db", help="Path to the database file (default: $XSPLITTR_DB or splitwise.db)")
     subparsers = parser.add_subparsers(dest="command", help="Commands")
 
     # Group commands
@@ -24,14 +37,92 @@ def main():
 
     # Bill commands
     bill_parser = subparsers.add_parser("bill", help="Bill management")
-    bill_parser.add_argument("action", choices=["add", "remove"], help="Action to perform")
+    bill_parser.add_argument("action", choices=["add", "remove", "import", "search"], help="Action to perform")
+    bill_parser.add_argument("query", nargs="?", help="Words to look for in bill titles (search)")
     bill_parser.add_argument("--group", required=True, help="Group name")
     bill_parser.add_argument("--title", help="Bill title", required=False)
     bill_parser.add_argument("--amount", type=float, help="Bill amount", required=False)
-    bill_parser.add_argument("--date", help="Bill date (YYYY-MM-DD)", required=False)
-    bill_parser.add_argument("--split", choices=["equal", "percentage"], required=False, help="Split method for the bill")
+    bill_parser.add_argument("--date", help="Bill date (YYYY-MM-DD or DD.MM.YYYY)", required=False)
+    bill_parser.add_argument("--split", choices=[method.lower() for method in BillManager.SPLIT_METHODS], required=False,
+                             help="Split method for the bill")
+    bill_parser.add_argument("--values", help="Split values as ann:50;bob:50, or ann;bob to split equally among some")
+    bill_parser.add_argument("--paid-by", help="Nickname of the payer")
+    bill_parser.add_argument("--file", help="CSV or JSONL file of bills to import", required=False)
+    bill_parser.add_argument("--chunk-size", type=int, default=1000, help="Bills per import transaction")
+    bill_parser.add_argument("--limit", type=int, default=20, help="Maximum number of search results")
 
-    args = parser.parse_args()
+    # Balance commands
+    balance_parser = subparsers.add_parser("balances", help="Participant balances")
+    balance_parser.add_argument("action", choices=["show", "rebuild"], help="Action to perform")
+    balance_parser.add_argument("--group", help="Group name (rebuild checks every group when omitted)")
+    balance_parser.add_argument("--check", action="store_true", help="Only report mismatches, do not rewrite")
+    balance_parser.add_argument("--from", dest="start", help="Only count bills dated on or after this date (show)")
+    balance_parser.add_argument("--to", dest="end", help="Only count bills dated on or before this date (show)")
+
+    # Settlement commands
+    settle_parser = subparsers.add_parser("settle", help="Calculate settlements")
+    settle_parser.add_argument("--group", help="Group name")
+    settle_parser.add_argument("--all", action="store_true", help="Settle every group in parallel")
+    settle_parser.add_argument("--exact", action="store_true", help="Search for the fewest transfers in small groups")
+    settle_parser.add_argument("--workers", type=int, help="Worker processes for --all (default: CPU count)")
+    settle_parser.add_argument("--from", dest="start", help="Only settle bills dated on or after this date")
+    settle_parser.add_argument("--to", dest="end", help="Only settle bills dated on or before this date")
+    settle_parser.add_argument("--format", choices=["text", "json"], default="text", help="Report format")
+    settle_parser.add_argument("--output", help="Write the report to this file (default: standard output)")
+
+    # Export commands
+    export_parser = subparsers.add_parser("export", help="Stream the ledger to CSV or JSONL")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"], default="jsonl", help="Output format")
+    export_parser.add_argument("--table", choices=ExportManager.TABLES + ["all"], default="all",
+                               help="Table to export (all is only available as JSONL)")
+    export_parser.add_argument("--group", help="Only export this group")
+    export_parser.add_argument("--output", help="Output file (default: standard output)")
+
+    # Spending reports
+    report_parser = subparsers.add_parser("report", help="Spending totals aggregated in the database")
+    report_parser.add_argument("report", choices=ReportManager.REPORTS,
+                               help="paid/owed per participant, spend per month or per group")
+    report_parser.add_argument("--group", help="Only report on this group")
+    report_parser.add_argument("--from", dest="start", help="Only count bills dated on or after this date")
+    report_parser.add_argument("--to", dest="end", help="Only count bills dated on or before this date")
+    report_parser.add_argument("--format", choices=["table", "csv", "json"], default="table", help="Output format")
+    report_parser.add_argument("--output", help="Output file (default: standard output)")
+
+    # API server
+    serve_parser = subparsers.add_parser("serve", help="Run the local JSON API server")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    serve_parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    serve_parser.add_argument("--readers", type=int, default=4, help="Read-only connections for queries")
+
+    # Archive commands
+    archive_parser = subparsers.add_parser("archive", help="Archive finished trips and read archived ones")
+    archive_parser.add_argument("action", choices=["create", "list", "show"], help="Action to perform")
+    archive_parser.add_argument("--group", help="Group name")
+    archive_parser.add_argument("--bills", action="store_true", help="Also list the archived bills (show)")
+    archive_parser.add_argument("--archive", help="Archive database (default: <database>-archive.db)")
+
+    # Profiling summary
+    stats_parser = subparsers.add_parser("stats", help="Show a query profile written with XSPLITTR_PROFILE set")
+    stats_parser.add_argument("--file", default=profiling.DEFAULT_OUTPUT, help="Profile summary to read")
+    stats_parser.add_argument("--sort", choices=["total", "count", "p95", "rows"], default="total",
+                              help="Order of the statement list")
+    stats_parser.add_argument("--limit", type=int, default=20, help="Statements to show")
+
+    args, extra = parser.parse_known_args()
+    if extra and args.command == "bill" and args.action == "search" and not args.query:
+        # argparse only fills the query right after the action; also accept it after the options
+        args.query = " ".join(extra)
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if getattr(args, "start", None) or getattr(args, "end", None):
+        # Check --from/--to once, before any command opens the database
+        try:
+            args.start, args.end = date_window(args.start, args.end)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+    if args.db:
+        set_db_path(args.db)
 
     if args.command == "group":
         group_manager = GroupManager()
@@ -45,8 +136,11 @@ def main():
             if not args.name:
                 print("Error: Group name is required.")
             else:
-                group_manager.delete_group(args.name)
-                print(f"Group '{args.name}' deleted.")
+                try:
+                    group_manager.delete_group(args.name)
+                    print(f"Group '{args.name}' deleted.")
+                except ValueError as e:
+                    print(f"Error: {e}")
 
     elif args.command == "participant":
         participant_manager = ParticipantManager()
@@ -66,17 +160,206 @@ def main():
     elif args.command == "bill":
         bill_manager = BillManager()
         if args.action == "add":
-            if not args.group or not args.title or args.amount is None or not args.date or not args.split:
-                print("Error: Group name, title, amount, date, and split method are required.")
+            if not args.group or not args.title or args.amount is None or not args.date or not args.split \
+                    or not args.paid_by:
+                print("Error: Group name, title, amount, date, split method and payer are required.")
             else:
-                bill_manager.add_bill(args.group, args.title, args.amount, args.date, args.split)
-                print(f"Bill '{args.title}' added to group '{args.group}'.")
+                group_id = bill_manager.get_group_id(args.group)
+                payer_id = bill_manager.get_group_members(group_id).get(args.paid_by) if group_id else None
+                try:
+                    bill_manager.add_bill(args.group, args.title, args.amount, args.date, args.split,
+                                          parse_split_values(args.values), payer_id)
+                    print(f"Bill '{args.title}' added to group '{args.group}'.")
+                except ValueError as e:
+                    print(f"Error: {e}")
         elif args.action == "remove":
             if not args.group or not args.title:
                 print("Error: Group name and title are required.")
             else:
                 bill_manager.remove_bill(args.group, args.title)
                 print(f"Bill '{args.title}' removed from group '{args.group}'.")
+        elif args.action == "import":
+            if not args.file:
+                print("Error: Group name and file are required.")
+            else:
+                def report_progress(processed, imported, rejected):
+                    print(f"Processed {processed} rows: {imported} imported, {rejected} rejected.", file=sys.stderr)
+
+                try:
+                    imported, rejected = bill_manager.import_bills(
+                        args.group, read_bill_rows(args.file), args.chunk_size, report_progress)
+                except ValueError as e:
+                    print(f"Error: {e}")
+                else:
+                    for line_number, reason in rejected:
+                        print(f"Rejected line {line_number}: {reason}")
+                    print(f"Imported {imported} bill(s) into group '{args.group}', rejected {len(rejected)}.")
+        elif args.action == "search":
+            if not args.query:
+                print("Error: Group name and search query are required.")
+            else:
+                try:
+                    bills = bill_manager.search_bills(args.group, args.query, args.limit)
+                except ValueError as e:
+                    print(f"Error: {e}")
+                else:
+                    for bill in bills:
+                        print(f"{bill.date}  {bill.title}: CHF {bill.amount:.2f} ({bill.split_method})")
+                    if not bills:
+                        print(f"No bills in group '{args.group}' match '{args.query}'.")
+
+    elif args.command == "balances":
+        bill_manager = BillManager()
+        if args.action == "show":
+            if not args.group:
+                print("Error: Group name is required.")
+            else:
+                try:
+                    balances = bill_manager.calculate_balances(args.group, args.start, args.end)
+                except ValueError as e:
+                    print(f"Error: {e}")
+                else:
+                    for nickname, balance in balances.items():
+                        print(f"{nickname}: CHF {balance:.2f}")
+        elif args.action == "rebuild":
+            try:
+                mismatches = bill_manager.rebuild_balances(args.group, dry_run=args.check)
+            except ValueError as e:
+                print(f"Error: {e}")
+            else:
+                for group_name, nickname, stored, expected in mismatches:
+                    stored = "missing" if stored is None else f"{stored:.2f}"
+                    print(f"{group_name}/{nickname}: stored {stored}, expected {expected:.2f}")
+                if not mismatches:
+                    print("Balances match the bill history.")
+                elif not args.check:
+                    print(f"Rebuilt {len(mismatches)} balance(s).")
+
+    elif args.command == "settle":
+        bill_manager = BillManager()
+        results = None
+        if not args.all and not args.group:
+            print("Error: Either a group name or --all is required.")
+        else:
+            try:
+                if args.all:
+                    results = bill_manager.settle_all_groups(exact=args.exact, workers=args.workers,
+                                                             start=args.start, end=args.end)
+                else:
+                    results = {args.group: bill_manager.calculate_settlements(args.group, exact=args.exact,
+                                                                              start=args.start, end=args.end)}
+            except ValueError as e:
+                print(f"Error: {e}")
+
+        if results is not None:
+            out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+            try:
+                if args.format == "json":
+                    json.dump({group_name: [settlement._asdict() for settlement in settlements]
+                               for group_name, settlements in results.items()}, out, indent=2)
+                    out.write("\n")
+                else:
+                    for group_name, settlements in results.items():
+                        out.write(f"{group_name}\n")
+                        for settlement in settlements:
+                            out.write(f"  {format_settlement(settlement)}\n")
+                        if not settlements:
+                            out.write("  No settlements required.\n")
+            finally:
+                if args.output:
+                    out.close()
+
+    elif args.command == "export":
+        export_manager = ExportManager()
+        if args.format == "csv" and args.table == "all":
+            print("Error: CSV exports need a single --table.")
+        else:
+            out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+            try:
+                tables = ExportManager.TABLES if args.table == "all" else [args.table]
+                for table in tables:
+                    columns, rows = export_manager.iter_table(table, args.group)
+                    if args.format == "csv":
+                        write_csv(out, columns, rows)
+                    else:
+                        write_jsonl(out, columns, rows, table if args.table == "all" else None)
+            except ValueError as e:
+                print(f"Error: {e}")
+            except BrokenPipeError:
+                # The reader went away (e.g. piped into head); stop quietly
+                sys.stdout = open(os.devnull, "w")
+            finally:
+                if args.output:
+                    out.close()
+
+    elif args.command == "report":
+        writers = {"table": write_table, "csv": write_csv, "json": write_json}
+        try:
+            columns, rows = ReportManager().report(args.report, args.group, args.start, args.end)
+        except ValueError as e:
+            print(f"Error: {e}")
+        else:
+            out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+            try:
+                writers[args.format](out, columns, rows)
+            except BrokenPipeError:
+                sys.stdout = open(os.devnull, "w")
+            finally:
+                if args.output:
+                    out.close()
+
+    elif args.command == "serve":
+        server.run(host=args.host, port=args.port, readers=args.readers)
+
+    elif args.command == "archive":
+        archive_manager = ArchiveManager(archive_path=args.archive)
+        if args.action == "create":
+            if not args.group:
+                print("Error: Group name is required.")
+            else:
+                try:
+                    settlements = archive_manager.archive_group(args.group)
+                    print(f"Group '{args.group}' archived to {archive_manager.archive_path} "
+                          f"with {len(settlements)} settlement(s).")
+                except ValueError as e:
+                    print(f"Error: {e}")
+        elif args.action == "list":
+            for group_id, name, archived_at, bill_count, total_amount in archive_manager.list_archived():
+                print(f"{name} (archived {archived_at}): {bill_count} bill(s), CHF {total_amount:.2f}")
+        elif args.action == "show":
+            group_id = archive_manager.archived_group_id(args.group) if args.group else None
+            if not group_id:
+                print(f"Error: No archived group named '{args.group}'.")
+            else:
+                print("Final balances:")
+                for nickname, balance in archive_manager.get_archived_balances(group_id).items():
+                    print(f"  {nickname}: CHF {balance:.2f}")
+                print("Settlements:")
+                for settlement in archive_manager.get_archived_settlements(group_id):
+                    print(f"  {format_settlement(settlement)}")
+                if args.bills:
+                    print("Bills:")
+                    for bill_id, title, amount, date, split_method, payer in archive_manager.get_archived_bills(group_id):
+                        print(f"  {date} {title}: CHF {amount:.2f} ({split_method}, paid by {payer})")
+
+    elif args.command == "stats":
+        try:
+            summary = profiling.load_summary(args.file)
+        except FileNotFoundError:
+            print(f"Error: No profile at '{args.file}'. Run a command with {profiling.PROFILE_ENV}=1 first.")
+        else:
+            print(f"{'method':<40} {'queries':>8} {'statements':>10} {'rows':>8} {'total ms':>10}")
+            methods = sorted(summary["methods"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+            for method, totals in methods:
+                print(f"{method:<40} {totals['queries']:>8} {totals['sqlite_statements']:>10} "
+                      f"{totals['rows']:>8} {totals['total_ms']:>10.2f}")
+
+            sort_key = {"total": "total_ms", "count": "count", "p95": "p95_ms", "rows": "rows"}[args.sort]
+            statements = sorted(summary["statements"], key=lambda statement: statement[sort_key], reverse=True)
+            print(f"\n{'count':>8} {'rows':>8} {'total ms':>10} {'p95 ms':>8}  caller / statement")
+            for statement in statements[:args.limit]:
+                print(f"{statement['count']:>8} {statement['rows']:>8} {statement['total_ms']:>10.2f} "
+                      f"{statement['p95_ms']:>8.2f}  {statement['caller']}: {statement['sql'][:100]}")
 
     else:
         parser.print_help()
@@ -1,30 +1,45 @@
-from database import Database
+from database import get_database
+from group import GroupNotFoundError
+from rows import Participant
 
 class ParticipantManager:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        self.db = db or get_database()
 
     def add_participant(self, group_name, first_name, last_name, nickname):
         group_id = self.get_group_id(group_name)
         if not group_id:
-            raise ValueError(f"Group '{group_name}' does not exist.")
+            raise GroupNotFoundError(group_name)
         query = """
             INSERT INTO participants (first_name, last_name, nickname, group_id)
             VALUES (?, ?, ?, ?)
         """
         self.db.execute_query(query, (first_name, last_name, nickname, group_id))
+        self.db.identity.invalidate_members(group_id)
 
     def delete_participant(self, group_name, nickname):
+        """Delete a participant of a group; return False if the group has no such participant."""
         group_id = self.get_group_id(group_name)
         if not group_id:
-            raise ValueError(f"Group '{group_name}' does not exist.")
+            raise GroupNotFoundError(group_name)
         query = """
             DELETE FROM participants 
             WHERE nickname = ? AND group_id = ?
         """
-        self.db.execute_query(query, (nickname, group_id))
+        deleted = self.db.execute_query(query, (nickname, group_id)).rowcount
+        self.db.identity.invalidate_members(group_id)
+        return deleted > 0
+
+    def list_participants(self, group_name):
+        group_id = self.get_group_id(group_name)
+        if not group_id:
+            raise GroupNotFoundError(group_name)
+        query = """
+            SELECT id, first_name, last_name, nickname, group_id
+            FROM participants
+            WHERE group_id = ?
+        """
+        return self.db.fetch_objects(query, (group_id,), Participant)
 
     def get_group_id(self, group_name):
-        query = "SELECT id FROM groups WHERE name = ?"
-        result = self.db.fetch_one(query, (group_name,))
-        return result[0] if result else None
+        return self.db.identity.group_id(group_name)
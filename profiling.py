@@ -0,0 +1,203 @@
+"""Opt-in query profiling for Database connections.
+
+Set XSPLITTR_PROFILE to a file path (or to 1 for xsplittr-profile.json) and every
+Database opened afterwards records, per statement and calling manager method (for
+example BillManager.calculate_balances), how often it ran, its total and p95 latency
+and the rows it returned. sqlite3's trace callback additionally counts every statement
+SQLite runs, including trigger bodies and transaction control, per calling method.
+The summary is written as JSON when the process exits; `python main.py stats` shows it.
+
+Profiling walks the Python stack on every statement, so leave it off in normal use.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+PROFILE_ENV = "XSPLITTR_PROFILE"
+DEFAULT_OUTPUT = "xsplittr-profile.json"
+# Frames in these modules belong to the database layer and are skipped when looking for the caller
+_DATABASE_MODULES = ("database.py", "profiling.py", "result_cache.py", "identity.py")
+_STDLIB = os.path.dirname(os.__file__)
+
+
+def calling_method():
+    """Return the innermost manager method on the stack, e.g. "BillManager.add_bill".
+
+    Closures and lambdas count as part of the method that defines them. Falls back to
+    module.function of the first caller outside the database layer.
+    """
+    frame = sys._getframe(1)
+    fallback = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename.startswith(_STDLIB):
+            frame = frame.f_back
+            continue
+        instance = frame.f_locals.get("self")
+        if instance is not None and type(instance).__name__.endswith("Manager"):
+            name = getattr(code, "co_qualname", f"{type(instance).__name__}.{code.co_name}")
+            return name.split(".<locals>")[0]
+        if fallback is None and os.path.basename(code.co_filename) not in _DATABASE_MODULES:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            fallback = f"{module}.{code.co_name}"
+        frame = frame.f_back
+    return fallback or "unknown"
+
+
+class QueryProfile:
+    """Thread-safe per-(caller, statement) timings shared by every profiled connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.statements = {}
+        self.executed = {}
+
+    def record(self, key, seconds=0.0, rows=0, calls=0):
+        with self.lock:
+            entry = self.statements.get(key)
+            if entry is None:
+                entry = self.statements[key] = {"count": 0, "rows": 0, "latencies": []}
+            if calls:
+                entry["count"] += calls
+                entry["latencies"].append(seconds)
+            elif entry["latencies"]:
+                # Fetching is part of the latest execution of the statement
+                entry["latencies"][-1] += seconds
+            entry["rows"] += rows
+
+    def count_executed(self, caller):
+        with self.lock:
+            self.executed[caller] = self.executed.get(caller, 0) + 1
+
+    def summary(self):
+        """Return the profile as a JSON-serializable dict, slowest statements first."""
+        with self.lock:
+            statements = []
+            for (caller, sql), entry in self.statements.items():
+                latencies = sorted(entry["latencies"])
+                statements.append({
+                    "caller": caller,
+                    "sql": sql,
+                    "count": entry["count"],
+                    "rows": entry["rows"],
+                    "total_ms": sum(latencies) * 1000,
+                    "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+                    if latencies else 0.0,
+                })
+            statements.sort(key=lambda statement: statement["total_ms"], reverse=True)
+
+            methods = {}
+            for statement in statements:
+                method = methods.setdefault(statement["caller"], {"queries": 0, "sqlite_statements": 0,
+                                                                  "rows": 0, "total_ms": 0.0})
+                method["queries"] += statement["count"]
+                method["rows"] += statement["rows"]
+                method["total_ms"] += statement["total_ms"]
+            for caller, executed in self.executed.items():
+                methods.setdefault(caller, {"queries": 0, "sqlite_statements": 0, "rows": 0, "total_ms": 0.0})
+                methods[caller]["sqlite_statements"] = executed
+
+        return {"pid": os.getpid(), "methods": methods, "statements": statements}
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+profile = QueryProfile()
+_output_path = None
+
+
+def enabled():
+    return _output_path is not None
+
+
+def enable(output_path=DEFAULT_OUTPUT):
+    """Profile every Database opened from now on and write the summary to output_path on exit."""
+    global _output_path
+    if _output_path is None:
+        atexit.register(_write_on_exit)
+    _output_path = output_path
+
+
+def _write_on_exit():
+    if profile.statements or profile.executed:
+        profile.write(_output_path)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that times execution and fetching and counts the rows returned."""
+
+    _key = None
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def _timed(self, execute, sql, parameters):
+        self._key = (calling_method(), " ".join(sql.split()))
+        start = time.perf_counter()
+        try:
+            return execute(sql, parameters)
+        finally:
+            profile.record(self._key, time.perf_counter() - start, calls=1)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def __next__(self):
+        return self._fetch(super().__next__)
+
+    def _fetch(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        if self._key is not None:
+            rows = len(result) if isinstance(result, list) else int(result is not None)
+            profile.record(self._key, time.perf_counter() - start, rows)
+        return result
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors are profiled and whose statements are counted per caller."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(lambda statement: profile.count_executed(calling_method()))
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    """Return the sqlite3 connection class for new Database connections."""
+    return ProfiledConnection if enabled() else sqlite3.Connection
+
+
+def load_summary(path=DEFAULT_OUTPUT):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+if os.environ.get(PROFILE_ENV):
+    enable(DEFAULT_OUTPUT if os.environ[PROFILE_ENV].lower() in ("1", "true", "yes") else os.environ[PROFILE_ENV])
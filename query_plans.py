@@ -0,0 +1,90 @@
+"""Check that the hot read paths are served by indexes.
+
+Runs the manager methods against a scratch database, records every SELECT they issue
+through the sqlite3 trace callback and runs EXPLAIN QUERY PLAN on each one. Exits with
+a non-zero status if any of them falls back to a full scan of a ledger table.
+
+    python query_plans.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+from database import Database
+from group import GroupManager
+from participant import ParticipantManager
+from bill import BillManager
+
+HOT_TABLES = ("participants", "bills", "bill_splits", "participant_balances")
+FULL_SCAN = re.compile(r"^SCAN (\w+)")
+TABLE_ALIAS = re.compile(r"\b(participants|bills|bill_splits|participant_balances)\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+SQL_KEYWORDS = {"WHERE", "JOIN", "LEFT", "INNER", "ON", "GROUP", "ORDER", "LIMIT", "SET", "VALUES", "USING"}
+
+
+def collect_hot_queries(db):
+    """Exercise the managers on db and return the distinct SELECT statements they run."""
+    group_manager, participant_manager, bill_manager = GroupManager(db), ParticipantManager(db), BillManager(db)
+
+    group_manager.create_group("Plans")
+    for nickname in ("ann", "bob", "cat"):
+        participant_manager.add_participant("Plans", nickname.title(), "Test", nickname)
+    payer_id = db.fetch_one("SELECT id FROM participants WHERE nickname = ?", ("ann",))[0]
+
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        bill_manager.add_bill("Plans", "Dinner", 90.0, "2024-01-01", "Equal", paid_by=payer_id)
+        bill_manager.add_bill("Plans", "Taxi", 30.0, "2024-01-02", "Percentage",
+                              split_values=[("ann", 50), ("bob", 50)], paid_by=payer_id)
+        bill_manager.calculate_balances("Plans")
+        bill_manager.calculate_settlements("Plans")
+        bill_manager.get_bill_page("Plans")
+        bill_manager.get_bill_row(1)
+        bill_manager.calculate_balances("Plans", "2024-01-01", "2024-01-01")
+        bill_manager.calculate_settlements("Plans", start="2024-01-02")
+        bill_manager.bills_between("Plans", "2024-01-01", "2024-01-31")
+        bill_manager.search_bills("Plans", "din")
+    finally:
+        db.conn.set_trace_callback(None)
+
+    queries = [s.strip() for s in statements if s.lstrip().upper().startswith(("SELECT", "WITH"))]
+    return list(dict.fromkeys(queries))
+
+
+def hot_table_names(query):
+    """Return the names a query uses for the hot tables, including their aliases."""
+    names = set(HOT_TABLES)
+    for table, alias in TABLE_ALIAS.findall(query):
+        if alias.upper() not in SQL_KEYWORDS:
+            names.add(alias)
+    return names
+
+
+def find_table_scans(db, queries):
+    """Return (query, plan detail) pairs for every query that scans a hot table."""
+    scans = []
+    for query in queries:
+        names = hot_table_names(query)
+        for detail in db.explain(query):
+            match = FULL_SCAN.match(detail)
+            if match and match.group(1) in names:
+                scans.append((query, detail))
+    return scans
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "plans.db"))
+        queries = collect_hot_queries(db)
+        scans = find_table_scans(db, queries)
+        db.close_connection()
+
+    for query, detail in scans:
+        print(f"{detail}\n    {' '.join(query.split())}")
+    print(f"Checked {len(queries)} queries, {len(scans)} full table scans.")
+    return 1 if scans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
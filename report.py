@@ -0,0 +1,102 @@
+from database import get_database
+from dates import date_window
+from group import GroupNotFoundError
+
+
+class ReportManager:
+    """Spending reports aggregated in SQL, one GROUP BY query per report, streamed row by row."""
+
+    REPORTS = ["paid", "owed", "monthly", "groups"]
+
+    def __init__(self, db=None):
+        self.db = db or get_database()
+
+    def report(self, name, group_name=None, start=None, end=None, batch_size=1000):
+        """Return (columns, rows) for a report over every group or one, optionally for a date window.
+
+        paid     per participant: bills paid and their total
+        owed     per participant: bills taken part in and the total owed
+        monthly  per group and month: bills and their total
+        groups   per group: bills, total, average bill and the first and last date
+        """
+        start, end = date_window(start, end)
+        where, params = self._filters(group_name, start, end)
+        if name == "paid":
+            columns = ["group", "participant", "bills", "total_paid"]
+            query = f"""
+                SELECT g.name, p.nickname, COUNT(*), ROUND(SUM(b.amount), 2)
+                FROM bills b
+                JOIN groups g ON g.id = b.group_id
+                JOIN participants p ON p.id = b.paid_by
+                WHERE {where}
+                GROUP BY b.paid_by
+                ORDER BY g.name, p.nickname
+            """
+        elif name == "owed":
+            columns = ["group", "participant", "bills", "total_owed"]
+            if start or end:
+                # Range-scan the bills in the window first, then their splits by bill
+                query = f"""
+                    SELECT g.name, p.nickname, COUNT(*), ROUND(SUM(bs.amount), 2)
+                    FROM bills b
+                    CROSS JOIN bill_splits bs ON bs.bill_id = b.id
+                    JOIN groups g ON g.id = b.group_id
+                    JOIN participants p ON p.id = bs.participant_id
+                    WHERE {where}
+                    GROUP BY bs.participant_id
+                    ORDER BY g.name, p.nickname
+                """
+            else:
+                # Without a window the bills are not needed: idx_bill_splits_participant
+                # already holds the splits in participant order
+                where, params = self._filters(group_name, group_column="p.group_id")
+                query = f"""
+                    SELECT g.name, p.nickname, COUNT(*), ROUND(SUM(bs.amount), 2)
+                    FROM bill_splits bs
+                    JOIN participants p ON p.id = bs.participant_id
+                    JOIN groups g ON g.id = p.group_id
+                    WHERE {where}
+                    GROUP BY bs.participant_id
+                    ORDER BY g.name, p.nickname
+                """
+        elif name == "monthly":
+            columns = ["group", "month", "bills", "total"]
+            query = f"""
+                SELECT g.name, substr(b.date, 1, 7) AS month, COUNT(*), ROUND(SUM(b.amount), 2)
+                FROM bills b
+                JOIN groups g ON g.id = b.group_id
+                WHERE {where}
+                GROUP BY b.group_id, month
+                ORDER BY g.name, month
+            """
+        elif name == "groups":
+            columns = ["group", "bills", "total", "average", "first_date", "last_date"]
+            query = f"""
+                SELECT g.name, COUNT(*), ROUND(SUM(b.amount), 2), ROUND(AVG(b.amount), 2), MIN(b.date), MAX(b.date)
+                FROM bills b
+                JOIN groups g ON g.id = b.group_id
+                WHERE {where}
+                GROUP BY b.group_id
+                ORDER BY g.name
+            """
+        else:
+            raise ValueError(f"Unknown report '{name}', expected one of {', '.join(self.REPORTS)}.")
+
+        return columns, self.db.iter_rows(query, params, batch_size)
+
+    def _filters(self, group_name, start=None, end=None, group_column="b.group_id"):
+        """Build the WHERE clause on bills b; only the filters in use are added, so the indexes apply."""
+        conditions, params = [], {}
+        if group_name is not None:
+            group_id = self.db.identity.group_id(group_name)
+            if not group_id:
+                raise GroupNotFoundError(group_name)
+            conditions.append(f"{group_column} = :group_id")
+            params["group_id"] = group_id
+        if start:
+            conditions.append("b.date >= :start")
+            params["start"] = start
+        if end:
+            conditions.append("b.date <= :end")
+            params["end"] = end
+        return " AND ".join(conditions) or "1", params
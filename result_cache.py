@@ -0,0 +1,57 @@
+import json
+
+
+class ResultCache:
+    """Computed per-group results (balances, settlements) keyed by the group's data version.
+
+    Triggers bump groups.data_version on every bill and participant write, so a
+    cached result is reused exactly as long as its group is unchanged, whichever
+    connection or process made the change. Each Database owns one; results live in
+    memory and, when persist is set, in the settlement_cache table so that they also
+    survive restarts. Read-only connections use stored results but never store any.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.entries = {}
+
+    def version(self, group_id):
+        result = self.db.fetch_one("SELECT data_version FROM groups WHERE id = ?", (group_id,))
+        return result[0] if result else None
+
+    def get(self, group_id, key, compute, persist=False, decode=None):
+        """Return compute() for the group, reusing the cached result while the group is unchanged.
+
+        Results are stored as JSON in the table; decode rebuilds them from the parsed JSON.
+        The returned value is shared with the cache; do not modify it.
+        """
+        version = self.version(group_id)
+        entry = self.entries.get((group_id, key))
+        if entry and entry[0] == version:
+            return entry[1]
+
+        stored = self.db.fetch_one("""
+            SELECT data_version, result FROM settlement_cache WHERE group_id = ? AND cache_key = ?
+        """, (group_id, key)) if persist else None
+
+        if stored and stored[0] == version:
+            value = json.loads(stored[1])
+            if decode:
+                value = decode(value)
+        else:
+            value = compute()
+            if persist and not self.db.read_only:
+                self.db.execute_query("""
+                    INSERT OR REPLACE INTO settlement_cache (group_id, cache_key, data_version, result)
+                    VALUES (?, ?, ?, ?)
+                """, (group_id, key, version, json.dumps(value)))
+
+        self.entries[(group_id, key)] = (version, value)
+        return value
+
+    def invalidate(self, group_id):
+        for key in [key for key in self.entries if key[0] == group_id]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,101 @@
+"""Typed row objects for ledger data.
+
+The dataclasses use __slots__, so each instance stores only its fields. Use them
+with Database.fetch_objects / Database.iter_rows(row_type=...), which build them
+through a sqlite row factory. Large split sets are held column-wise in SplitColumns.
+"""
+from array import array
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Group:
+    __slots__ = ("id", "name")
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class Participant:
+    __slots__ = ("id", "first_name", "last_name", "nickname", "group_id")
+    id: int
+    first_name: str
+    last_name: str
+    nickname: str
+    group_id: int
+
+
+@dataclass(frozen=True)
+class Bill:
+    __slots__ = ("id", "title", "amount", "date", "split_method", "paid_by", "group_id")
+    id: int
+    title: str
+    amount: float
+    date: str
+    split_method: str
+    paid_by: int
+    group_id: int
+
+
+@dataclass(frozen=True)
+class BillListing:
+    """A bill as shown in the bill table, with its splits already formatted."""
+    __slots__ = ("id", "title", "amount", "date", "split_method", "split_details")
+    id: int
+    title: str
+    amount: float
+    date: str
+    split_method: str
+    split_details: str
+
+
+@dataclass(frozen=True)
+class Split:
+    __slots__ = ("bill_id", "participant_id", "amount")
+    bill_id: int
+    participant_id: int
+    amount: float
+
+
+def row_factory(row_type):
+    """Return a sqlite3 row factory that builds row_type from each result row."""
+    return lambda cursor, row: row_type(*row)
+
+
+class SplitColumns:
+    """Splits stored column-wise in typed arrays: 24 bytes per split instead of a tuple of objects."""
+
+    def __init__(self):
+        self.bill_ids = array("q")
+        self.participant_ids = array("q")
+        self.amounts = array("d")
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build the columns from (bill_id, participant_id, amount) rows, consuming them one by one."""
+        columns = cls()
+        for bill_id, participant_id, amount in rows:
+            columns.append(bill_id, participant_id, amount)
+        return columns
+
+    def append(self, bill_id, participant_id, amount):
+        self.bill_ids.append(bill_id)
+        self.participant_ids.append(participant_id)
+        self.amounts.append(amount)
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __getitem__(self, index):
+        return Split(self.bill_ids[index], self.participant_ids[index], self.amounts[index])
+
+    def __iter__(self):
+        for bill_id, participant_id, amount in zip(self.bill_ids, self.participant_ids, self.amounts):
+            yield Split(bill_id, participant_id, amount)
+
+    def totals_by_participant(self):
+        """Return {participant_id: total owed} over all splits."""
+        totals = {}
+        for participant_id, amount in zip(self.participant_ids, self.amounts):
+            totals[participant_id] = totals.get(participant_id, 0.0) + amount
+        return totals
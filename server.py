@@ -0,0 +1,245 @@
+"""Local JSON API over the Xsplittr managers, built on asyncio and the standard library.
+
+All writes go through a WriteQueue: one writer thread that owns the only read-write
+connection and commits concurrent requests together in shared transactions. Reads
+run on a pool of threads with one read-only connection each. The event loop
+only parses requests and serializes responses, so many clients can share one
+local database.
+
+    python main.py serve --port 8765
+
+Routes:
+    GET    /groups
+    POST   /groups                               {"name"}
+    DELETE /groups/<group>
+    GET    /groups/<group>/participants
+    POST   /groups/<group>/participants          {"first_name", "last_name", "nickname"}
+    DELETE /groups/<group>/participants/<nickname>
+    GET    /groups/<group>/bills?after_id=0&limit=200
+    POST   /groups/<group>/bills                 {"title", "amount", "date", "paid_by",
+                                                  "split_method", "split_values"}
+    DELETE /bills/<id>
+    GET    /groups/<group>/balances?from=2024-01-01&to=2024-01-31
+    GET    /groups/<group>/settlements?exact=1&from=2024-01-01&to=2024-01-31
+"""
+import asyncio
+import dataclasses
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from database import Database, WriteQueue, get_db_path
+from group import GroupManager, GroupNotFoundError
+from participant import ParticipantManager
+from bill import BillManager
+from bill_import import parse_split_values
+
+MAX_BODY_BYTES = 1024 * 1024
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def to_json(value):
+    """Serialize manager results: row dataclasses, Settlement namedtuples, lists and dicts."""
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    if isinstance(value, list):
+        return [to_json(item) for item in value]
+    return value
+
+
+class XsplittrServer:
+    def __init__(self, db_path=None, readers=4):
+        self.db_path = db_path or get_db_path()
+        self._local = threading.local()
+        # The writer opens first, so the schema is current before readers connect
+        self.writes = WriteQueue(self.db_path)
+        self.readers = ThreadPoolExecutor(readers, "xsplittr-reader", self._open_reader)
+
+    def _open_reader(self):
+        self._local.db = Database(self.db_path, read_only=True)
+
+    def _read(self, fn, *args):
+        # Cached ids are checked against the group's data version, so writes made
+        # through the writer connection are seen
+        return fn(self._local.db, *args)
+
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, self._read, fn, *args)
+
+    async def write(self, fn, *args):
+        return await asyncio.wrap_future(self.writes.submit(fn, *args))
+
+    async def route(self, method, path, query, body):
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+
+        if parts == ["groups"]:
+            if method == "GET":
+                return 200, await self.read(lambda db: GroupManager(db).list_groups())
+            if method == "POST":
+                name = require(body, "name")
+                await self.write(lambda db: GroupManager(db).create_group(name))
+                return 201, {"name": name}
+
+        elif len(parts) == 2 and parts[0] == "groups" and method == "DELETE":
+            await self.write(lambda db: GroupManager(db).delete_group(parts[1]))
+            return 200, {"deleted": parts[1]}
+
+        elif len(parts) >= 3 and parts[0] == "groups":
+            group_name, resource = parts[1], parts[2]
+
+            if resource == "participants" and len(parts) == 3:
+                if method == "GET":
+                    return 200, await self.read(lambda db: ParticipantManager(db).list_participants(group_name))
+                if method == "POST":
+                    first_name, last_name, nickname = (require(body, "first_name"), require(body, "last_name"),
+                                                       require(body, "nickname"))
+                    await self.write(lambda db: ParticipantManager(db).add_participant(
+                        group_name, first_name, last_name, nickname))
+                    return 201, {"nickname": nickname}
+
+            elif resource == "participants" and len(parts) == 4 and method == "DELETE":
+                if not await self.write(lambda db: ParticipantManager(db).delete_participant(group_name, parts[3])):
+                    raise HttpError(404, f"Participant '{parts[3]}' is not part of the group '{group_name}'.")
+                return 200, {"deleted": parts[3]}
+
+            elif resource == "bills" and len(parts) == 3:
+                if method == "GET":
+                    after_id = int(query.get("after_id", 0))
+                    limit = min(int(query.get("limit", 200)), 1000)
+                    return 200, await self.read(
+                        lambda db: BillManager(db).get_bill_page(group_name, after_id, limit))
+                if method == "POST":
+                    bill_id = await self.write(add_bill, group_name, body)
+                    return 201, {"id": bill_id}
+
+            elif resource == "balances" and len(parts) == 3 and method == "GET":
+                start, end = query.get("from"), query.get("to")
+                return 200, await self.read(lambda db: BillManager(db).calculate_balances(group_name, start, end))
+
+            elif resource == "settlements" and len(parts) == 3 and method == "GET":
+                exact = query.get("exact") in ("1", "true")
+                start, end = query.get("from"), query.get("to")
+                return 200, await self.read(lambda db: BillManager(db).calculate_settlements(
+                    group_name, exact=exact, start=start, end=end))
+
+            else:
+                raise HttpError(404, f"Unknown resource '{resource}'.")
+
+        elif len(parts) == 2 and parts[0] == "bills" and method == "DELETE":
+            bill_id = int(parts[1])
+            if not await self.write(lambda db: BillManager(db).remove_bill(bill_id)):
+                raise HttpError(404, f"Bill {bill_id} does not exist.")
+            return 200, {"deleted": bill_id}
+
+        else:
+            raise HttpError(404, f"No route for {path}.")
+
+        raise HttpError(405, f"{method} is not supported on {path}.")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                status, payload = await self.respond(method, target, headers, reader)
+                body = json.dumps(to_json(payload)).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method, target, headers, reader):
+        try:
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                raise HttpError(413, "Request body is too large.")
+            body = json.loads(await reader.readexactly(length)) if length else {}
+            url = urlsplit(target)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            return await self.route(method, url.path, query, body)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except GroupNotFoundError as e:
+            return 404, {"error": str(e)}
+        except sqlite3.IntegrityError as e:
+            return 409, {"error": str(e)}
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving {self.db_path} on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.writes.close()
+        self.readers.shutdown()
+
+
+def require(body, key):
+    if not isinstance(body, dict) or body.get(key) in (None, ""):
+        raise HttpError(400, f"'{key}' is required.")
+    return body[key]
+
+
+def add_bill(db, group_name, body):
+    """Add a bill posted as JSON; paid_by is a nickname and split_values is as for BillManager.add_bill."""
+    bill_manager = BillManager(db)
+    group_id = bill_manager.get_group_id(group_name)
+    if not group_id:
+        raise GroupNotFoundError(group_name)
+    payer = require(body, "paid_by")
+    paid_by = db.identity.participant_id(group_id, payer)
+    if paid_by is None:
+        raise ValueError(f"Payer '{payer}' is not part of the group '{group_name}'.")
+    split_values = parse_split_values(body.get("split_values"))
+    return bill_manager.add_bill(group_name, require(body, "title"), float(require(body, "amount")),
+                                 require(body, "date"), body.get("split_method") or "Equal", split_values, paid_by)
+
+
+def run(db_path=None, host="127.0.0.1", port=8765, readers=4):
+    server = XsplittrServer(db_path, readers)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    run()
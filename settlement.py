@@ -0,0 +1,116 @@
+import heapq
+import time
+from collections import namedtuple
+
+Settlement = namedtuple("Settlement", ["debtor", "creditor", "amount"])
+
+# Groups up to this size may be solved exactly; the subset search grows as 2^n.
+EXACT_SOLVER_LIMIT = 15
+
+
+def net_balances(balances):
+    """Reduce a {nickname: balance} mapping to non-zero balances in whole cents."""
+    cents = {name: int(round(balance * 100)) for name, balance in balances.items()}
+    return {name: amount for name, amount in cents.items() if amount != 0}
+
+
+def greedy_settlements(balances):
+    """Match the largest debtor with the largest creditor until all balances are settled.
+
+    Takes balances in cents and returns at most n-1 Settlement records.
+    """
+    debtors = [(amount, name) for name, amount in balances.items() if amount < 0]
+    creditors = [(-amount, name) for name, amount in balances.items() if amount > 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    settlements = []
+    while debtors and creditors:
+        debt, debtor = heapq.heappop(debtors)
+        credit, creditor = heapq.heappop(creditors)
+        amount = min(-debt, -credit)
+        settlements.append(Settlement(debtor, creditor, amount / 100))
+
+        if debt + amount < 0:
+            heapq.heappush(debtors, (debt + amount, debtor))
+        if credit + amount < 0:
+            heapq.heappush(creditors, (credit + amount, creditor))
+    return settlements
+
+
+def exact_settlements(balances, time_budget=0.5):
+    """Find the minimum number of transfers for a small group.
+
+    The fewest transfers come from splitting the people into as many zero-sum
+    subgroups as possible, each settled with (size - 1) transfers. Returns None
+    when the group is too large or the search runs past time_budget seconds.
+    """
+    names = list(balances)
+    n = len(names)
+    if n > EXACT_SOLVER_LIMIT:
+        return None
+
+    deadline = time.monotonic() + time_budget
+    amounts = [balances[name] for name in names]
+    full = (1 << n) - 1
+
+    subset_sum = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        lowest = (mask & -mask).bit_length() - 1
+        subset_sum[mask] = subset_sum[mask & (mask - 1)] + amounts[lowest]
+
+    # best[mask]: most zero-sum subgroups that the people in mask can be split into,
+    # last[mask]: the person added last on the way to that best split
+    best = [0] * (full + 1)
+    last = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        if not mask & 0xFF and time.monotonic() > deadline:
+            return None
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            candidate = best[mask ^ bit]
+            if candidate >= best[mask]:
+                best[mask] = candidate
+                last[mask] = bit
+        if subset_sum[mask] == 0:
+            best[mask] += 1
+
+    # Walk back through the choices, cutting a new subgroup at every zero-sum prefix
+    order = []
+    mask = full
+    while mask:
+        order.append(last[mask])
+        mask ^= last[mask]
+    order.reverse()
+
+    settlements = []
+    chunk, mask = {}, 0
+    for bit in order:
+        mask |= bit
+        name = names[bit.bit_length() - 1]
+        chunk[name] = balances[name]
+        if subset_sum[mask] == 0:
+            settlements.extend(greedy_settlements(chunk))
+            chunk = {}
+    settlements.extend(greedy_settlements(chunk))
+    return settlements
+
+
+def settle(balances, exact=False, time_budget=0.5):
+    """Turn {nickname: balance} into Settlement records.
+
+    Uses the heap-based greedy matcher, or the exact minimum-transfer solver when
+    exact is set and the group is small enough to finish within time_budget.
+    """
+    net = net_balances(balances)
+    if exact:
+        settlements = exact_settlements(net, time_budget)
+        if settlements is not None:
+            return settlements
+    return greedy_settlements(net)
+
+
+def format_settlement(settlement):
+    return f"{settlement.debtor} owes {settlement.creditor} CHF {settlement.amount:.2f}"
@@ -0,0 +1,99 @@
+"""Split engine: turn a bill amount and a split method into one owed amount per participant.
+
+Amounts are allocated in whole cents with the largest remainder method, so the
+splits of a bill always add up to exactly its amount. split_values depends on the
+method:
+
+    Equal       optional nicknames to split among (default: every member of the group)
+    Percentage  (nickname, percent) pairs totalling 100
+    Shares      (nickname, shares) pairs, e.g. 2 for someone who stayed two nights
+    Exact       (nickname, amount) pairs totalling the bill amount
+
+Participants are looked up in the {nickname: participant_id} map of the bill's group.
+"""
+import vectorized
+
+SPLIT_METHODS = ["Equal", "Percentage", "Shares", "Exact"]
+_METHODS_BY_NAME = {method.lower(): method for method in SPLIT_METHODS}
+
+
+def split_method_name(split_method):
+    """Return the canonical name of a split method, matched case-insensitively."""
+    method = _METHODS_BY_NAME.get((split_method or "").lower())
+    if not method:
+        raise ValueError(f"Unsupported split method '{split_method}', expected one of {', '.join(SPLIT_METHODS)}.")
+    return method
+
+
+def to_cents(amount):
+    return round(amount * 100)
+
+
+def compute_splits(amount, split_method, members, split_values=None, group_name=None):
+    """Return [(participant_id, owed_amount)] for a bill, summing exactly to amount."""
+    method = split_method_name(split_method)
+    cents = to_cents(amount)
+    where = f"the group '{group_name}'" if group_name else "the group"
+
+    if method == "Equal":
+        nicknames = [value if isinstance(value, str) else value[0] for value in split_values or ()]
+        participant_ids = _participant_ids(nicknames, members, where) if nicknames else list(members.values())
+        if not participant_ids:
+            raise ValueError("Cannot add a bill to a group with no participants.")
+        return list(zip(participant_ids, _cents_to_amounts(allocate(cents, [1] * len(participant_ids)))))
+
+    if not split_values:
+        raise ValueError(f"{method} splits need a value for every participant in the split.")
+    for entry in split_values:
+        if isinstance(entry, str) or entry[1] is None:
+            raise ValueError(f"{method} splits need a value for '{entry if isinstance(entry, str) else entry[0]}'.")
+    participant_ids = _participant_ids([nickname for nickname, _ in split_values], members, where)
+    values = [float(value) for _, value in split_values]
+    if any(value < 0 for value in values):
+        raise ValueError(f"{method} values cannot be negative.")
+
+    if method == "Exact":
+        owed = [to_cents(value) for value in values]
+        if sum(owed) != cents:
+            raise ValueError(f"Exact amounts add up to CHF {sum(owed) / 100:.2f}, not the bill's CHF {cents / 100:.2f}.")
+    else:
+        if method == "Percentage" and abs(sum(values) - 100) > 0.01:
+            raise ValueError("Percentages must total 100%.")
+        if not sum(values):
+            raise ValueError(f"{method} values must not all be zero.")
+        if vectorized.available() and len(values) >= vectorized.MIN_PARTICIPANTS:
+            owed = vectorized.allocate(cents, values)
+        else:
+            owed = allocate(cents, values)
+    return list(zip(participant_ids, _cents_to_amounts(owed)))
+
+
+def allocate(cents, weights):
+    """Divide cents in proportion to weights, as whole cents that add up to exactly cents.
+
+    Everyone gets the floor of their exact share; the cents left over go one each to the
+    largest fractional remainders, earlier participants first on ties.
+    """
+    total = sum(weights)
+    exact = [cents * weight / total for weight in weights]
+    owed = [int(share) for share in exact]
+    leftover = cents - sum(owed)
+    by_remainder = sorted(range(len(weights)), key=lambda i: owed[i] - exact[i])
+    for i in by_remainder[:leftover]:
+        owed[i] += 1
+    return owed
+
+
+def _participant_ids(nicknames, members, where):
+    participant_ids = []
+    for nickname in nicknames:
+        if nickname not in members:
+            raise ValueError(f"Participant '{nickname}' is not part of {where}.")
+        participant_ids.append(members[nickname])
+    if len(set(participant_ids)) != len(participant_ids):
+        raise ValueError("Each participant can appear only once in a split.")
+    return participant_ids
+
+
+def _cents_to_amounts(owed):
+    return [value / 100 for value in owed]
@@ -0,0 +1,122 @@
+"""Concurrent write stress test.
+
+Several processes add bills to the same database file at once, the way the GUI and
+CLI scripts do when they run side by side:
+
+    python stress.py --processes 4 --bills 500
+
+direct: every process writes each bill in its own transaction on its own connection,
+        relying on the busy timeout and retries to wait for the others.
+queue:  every process runs several producer threads that submit their bills to one
+        WriteQueue, which commits whatever is waiting in shared transactions.
+
+For each mode the script reports throughput, failed writes, and whether the number of
+bills in the database matches the number of writes that reported success.
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from bill import BillManager
+from database import Database, WriteQueue
+from group import GroupManager
+from participant import ParticipantManager
+
+GROUP = "Stress"
+
+
+def setup(db_path, participants):
+    db = Database(db_path)
+    GroupManager(db).create_group(GROUP)
+    for i in range(participants):
+        ParticipantManager(db).add_participant(GROUP, f"First{i}", f"Last{i}", f"p{i}")
+    payers = list(BillManager(db).get_group_members(BillManager(db).get_group_id(GROUP)).values())
+    db.close_connection()
+    return payers
+
+
+def add_bill(db, number, payer):
+    return BillManager(db).add_bill(GROUP, f"Bill {number}", 10 + number % 90, "01.01.2025", "Equal",
+                                    paid_by=payer)
+
+
+def write_direct(db_path, worker, bills, payers, threads, busy_timeout, retries):
+    db = Database(db_path, busy_timeout=busy_timeout, retries=retries)
+    written = failed = 0
+    for number in range(bills):
+        try:
+            add_bill(db, number, payers[(worker + number) % len(payers)])
+            written += 1
+        except sqlite3.OperationalError:
+            failed += 1
+    db.close_connection()
+    return written, failed
+
+
+def write_queued(db_path, worker, bills, payers, threads, busy_timeout, retries):
+    writes = WriteQueue(db_path, busy_timeout=busy_timeout, retries=retries)
+    outcomes = []
+
+    def produce(thread):
+        futures = [writes.submit(add_bill, number, payers[(worker + number) % len(payers)])
+                   for number in range(thread, bills, threads)]
+        for future in futures:
+            try:
+                future.result()
+                outcomes.append(True)
+            except sqlite3.OperationalError:
+                outcomes.append(False)
+
+    producers = [threading.Thread(target=produce, args=(thread,)) for thread in range(threads)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    writes.close()
+    return outcomes.count(True), outcomes.count(False)
+
+
+def run(mode, args):
+    with tempfile.TemporaryDirectory(prefix="xsplittr-stress-") as directory:
+        db_path = os.path.join(directory, "stress.db")
+        payers = setup(db_path, args.participants)
+        write = write_direct if mode == "direct" else write_queued
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.starmap(write, [
+                (db_path, worker, args.bills, payers, args.threads, args.busy_timeout, args.retries)
+                for worker in range(args.processes)])
+        elapsed = time.perf_counter() - start
+
+        written = sum(ok for ok, _ in results)
+        failed = sum(errors for _, errors in results)
+        db = Database(db_path)
+        stored = db.fetch_one("SELECT COUNT(*) FROM bills")[0]
+        db.close_connection()
+    print(f"{mode:<7} {written:>8} {failed:>7} {stored:>7} {'yes' if stored == written else 'NO':>10} "
+          f"{written / elapsed:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent writes from several processes")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--bills", type=int, default=500, help="Bills written by each process")
+    parser.add_argument("--threads", type=int, default=8, help="Producer threads per process in queue mode")
+    parser.add_argument("--participants", type=int, default=5)
+    parser.add_argument("--busy-timeout", type=int, help="Busy timeout in ms (default: BUSY_TIMEOUT_MS)")
+    parser.add_argument("--retries", type=int, default=3, help="Retries after the busy timeout runs out")
+    parser.add_argument("--mode", choices=["direct", "queue", "both"], default="both")
+    args = parser.parse_args()
+
+    print(f"{'mode':<7} {'written':>8} {'failed':>7} {'stored':>7} {'consistent':>10} {'bills/s':>10}")
+    for mode in (["direct", "queue"] if args.mode == "both" else [args.mode]):
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
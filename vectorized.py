@@ -0,0 +1,71 @@
+"""Optional NumPy backend for very large groups.
+
+Balances are computed with np.bincount over payer and split arrays, and percentage
+and share splits are allocated in a single vectorized step. BillManager and the split
+engine switch to it automatically above the size thresholds below when NumPy is
+installed. Equal splits stay in plain Python, which builds them faster than NumPy can.
+"""
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the SQL/pure-Python paths are used instead
+    np = None
+
+# Estimated splits (bills x participants) above which balances are recomputed with NumPy.
+# Below this the SQL aggregate is as fast, since reading the rows dominates both.
+MIN_SPLITS = 1_000_000
+# Participants above which weighted split amounts are allocated with NumPy
+MIN_PARTICIPANTS = 1_000
+
+_ID_AMOUNT = [("id", "i8"), ("amount", "f8")]
+
+
+def available():
+    return np is not None
+
+
+def load_ledger(db, group_id, batch_size=10000):
+    """Load a group's payments and splits as (participant_ids, payments, splits) arrays.
+
+    payments and splits are structured arrays of (id, amount), where id is the payer
+    or the split's participant.
+    """
+    participant_ids = np.fromiter(
+        (participant_id for participant_id, in db.iter_rows(
+            "SELECT id FROM participants WHERE group_id = ? ORDER BY id", (group_id,), batch_size)),
+        dtype="i8")
+    payments = np.fromiter(db.iter_rows(
+        "SELECT paid_by, amount FROM bills WHERE group_id = ?", (group_id,), batch_size), dtype=_ID_AMOUNT)
+    splits = np.fromiter(db.iter_rows("""
+        SELECT bs.participant_id, bs.amount
+        FROM bills b
+        JOIN bill_splits bs ON bs.bill_id = b.id
+        WHERE b.group_id = ?
+    """, (group_id,), batch_size), dtype=_ID_AMOUNT)
+    return participant_ids, payments, splits
+
+
+def balances(db, group_id):
+    """Return {participant_id: amount paid - amount owed} for a group."""
+    participant_ids, payments, splits = load_ledger(db, group_id)
+    if not len(participant_ids):
+        return {}
+    paid = _totals(participant_ids, payments)
+    owed = _totals(participant_ids, splits)
+    return dict(zip(participant_ids.tolist(), (paid - owed).tolist()))
+
+
+def _totals(participant_ids, rows):
+    """Sum amounts per participant with np.bincount, ignoring ids that are not in the group."""
+    positions = np.minimum(np.searchsorted(participant_ids, rows["id"]), len(participant_ids) - 1)
+    known = participant_ids[positions] == rows["id"]
+    return np.bincount(positions[known], weights=rows["amount"][known], minlength=len(participant_ids))
+
+
+def allocate(cents, weights):
+    """Divide cents in proportion to weights as whole cents adding up to exactly cents (see splits.allocate)."""
+    weights = np.asarray(weights, dtype="f8")
+    exact = cents * weights / weights.sum()
+    owed = np.floor(exact).astype("i8")
+    leftover = cents - int(owed.sum())
+    owed[np.argsort(owed - exact, kind="stable")[:leftover]] += 1
+    return owed.tolist()
@@ -0,0 +1,60 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from database import Database, get_db_path
+
+
+class WorkerSignals(QObject):
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """Run a function on the global thread pool and report back to the UI through signals."""
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.execute()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+    def execute(self):
+        return self.fn(*self.args, **self.kwargs)
+
+
+class DatabaseWorker(Worker):
+    """Worker whose function gets its own Database connection as the first argument.
+
+    sqlite connections cannot be shared across threads, so each task opens a
+    connection to the configured database and closes it when done.
+    """
+
+    def execute(self):
+        db = Database(get_db_path())
+        try:
+            return self.fn(db, *self.args, **self.kwargs)
+        finally:
+            db.close_connection()
+
+
+def start_worker(worker, on_result=None, on_error=None, on_finished=None):
+    """Connect the callbacks, which run on the UI thread, and queue the worker."""
+    if on_result:
+        worker.signals.result.connect(on_result)
+    if on_error:
+        worker.signals.error.connect(on_error)
+    if on_finished:
+        worker.signals.finished.connect(on_finished)
+    QThreadPool.globalInstance().start(worker)
+    return worker